@@ -1,14 +1,15 @@
 from __future__ import annotations
 from enum import auto
-from typing import Optional
-import math
+from typing import Callable, Optional
 
 from base_enum import BaseEnum
 from team import MonsterTeam
 from monster_base import MonsterBase
-from elements import Element, EffectivenessCalculator
+from elements import EffectivenessCalculator
+from battle_log import BattleLog, EventType
+from profiling import BattleProfiler
+from damage_table import DamageTable, compute_damage
 from data_structures.referential_array import *
-from helpers import Flamikin, Aquariuma, Vineon, Strikeon, Normake, Marititan, Leviatitan, Treetower, Infernoth
 
 
 class Battle:
@@ -23,12 +24,25 @@ class Battle:
         TEAM2 = auto()
         DRAW = auto()
 
-    def __init__(self, verbosity=0) -> None:
+    def __init__(self, verbosity=0, log: Optional[BattleLog]=None, profiler: Optional[BattleProfiler]=None,
+                 damage_table: Optional[DamageTable]=None, recorder: Optional[Callable[[Battle], None]]=None) -> None:
         """initialises the Battle class
+        log, if given, records every action, swap, hit, faint, level up and evolution of each battle.
+        profiler, if given, times each phase of every turn, see BattleProfiler.
+        damage_table, if given, looks damage up instead of computing it for every hit.
+        recorder, if given, is called with the battle once it has started and at the end of every turn
+        of each battle, see replay.BattleRecorder.
         Complexity: O(1)"""
         self.verbosity = verbosity
+        self.log = log
+        self.recorder = recorder
         self.team1_dead = False
         self.team2_dead = False
+        self.damage_table = damage_table
+        if damage_table is not None:
+            self._compute_damage = damage_table.compute_damage
+        if profiler is not None:
+            profiler.instrument(self)
 
     def process_turn(self) -> Optional[Battle.Result]:
         """
@@ -42,6 +56,9 @@ class Battle:
         """
         action1 = self.team1.choose_action(self.out1, self.out2)
         action2 = self.team2.choose_action(self.out2, self.out1)
+        if self.log is not None:
+            self.log.record(self.turn_number, EventType.ACTION, 1, self.out1.get_name(), amount=action1.value)
+            self.log.record(self.turn_number, EventType.ACTION, 2, self.out2.get_name(), amount=action2.value)
         if action1 == Battle.Action.SWAP:
             self.out1 = self._swap(self.out1, self.team1)
         if action2 == Battle.Action.SWAP:
@@ -69,24 +86,43 @@ class Battle:
         Complexity: O(n * process_turn), where n is the number of turns in the battle"""
         if self.verbosity > 0:
             print(f"Team 1: {team1} vs. Team 2: {team2}")
-        # Add any pregame logic here.
-        self.turn_number = 0
-        self.team1 = team1
-        self.team2 = team2
-        self.out1 = team1.retrieve_from_team()
-        self.out2 = team2.retrieve_from_team()
+        self.start(team1, team2)
+        recorder = self.recorder
+        if recorder is not None:
+            recorder(self)
         result = None
         while result is None:
+            self.turn_number += 1
             result = self.process_turn()
+            if recorder is not None:
+                recorder(self)
         # Add any postgame logic here.
+        if self.log is not None:
+            self.log.record(self.turn_number, EventType.BATTLE_END, 0, amount=result.value)
         return result
     
 
+    def start(self, team1: MonsterTeam, team2: MonsterTeam) -> None:
+        """Sets up a battle between team 1 and 2 without playing any turns.
+        Turns can then be played one at a time by incrementing turn_number and calling process_turn.
+        Complexity: O(Comp(retrieve_from_team))"""
+        self.turn_number = 0
+        self.team1_dead = False
+        self.team2_dead = False
+        self.team1 = team1
+        self.team2 = team2
+        self.out1 = team1.retrieve_from_team()
+        self.out2 = team2.retrieve_from_team()
+        if self.log is not None:
+            self.log.record(0, EventType.BATTLE_START, 0, self.out1.get_name(), self.out2.get_name())
+
     def _swap(self, currently_out: MonsterBase, team: MonsterTeam) -> MonsterBase:
         """Adds the currently out monster back to thw team and retrieves the next monster
         Complexity: O(Comp(add_to_team + retrieve_from_team))"""
         team.add_to_team(currently_out)
         new_out = team.retrieve_from_team()
+        if self.log is not None:
+            self.log.record(self.turn_number, EventType.SWAP, self._team_number(team), new_out.get_name(), currently_out.get_name())
         return new_out
     
     def _special(self, currently_out: MonsterBase, team: MonsterTeam) -> MonsterBase:
@@ -95,29 +131,23 @@ class Battle:
         team.add_to_team(currently_out)
         team.special()
         new_out = team.retrieve_from_team()
+        if self.log is not None:
+            self.log.record(self.turn_number, EventType.SPECIAL, self._team_number(team), new_out.get_name(), currently_out.get_name())
         return new_out
     
     def _compute_damage(self, attacking_monster: MonsterBase, defending_monster: MonsterBase) -> int:
         """Calculates the effective damage for the attacking monster on the defending monster based on their stats and elements
         Complexity: O(Comp(get_effectiveness))"""
-        attack = attacking_monster.get_attack()
-        defense = defending_monster.get_defense()
-
-        if defense < attack / 2:
-            damage = attack - defense
-        elif defense < attack:
-            damage = attack * 5/8 - defense / 4
-        else:
-            damage = attack / 4
-
-
-        attacking_monster_element = Element.from_string(attacking_monster.get_element())
-        defending_monster_element = Element.from_string(defending_monster.get_element())
-
-        damage_multiplier = EffectivenessCalculator.get_effectiveness(attacking_monster_element, defending_monster_element)
-        effective_damage = math.ceil(damage * damage_multiplier)
-        return effective_damage
+        return compute_damage(attacking_monster, defending_monster)
     
+    def _get_effectiveness(self, attacking_monster: MonsterBase, defending_monster: MonsterBase) -> float:
+        """Looks up the multiplier of the attacking monster's element against the defending monster's element
+        Complexity: O(Comp(get_effectiveness))"""
+        return EffectivenessCalculator.get_effectiveness(
+            attacking_monster.get_element_type(),
+            defending_monster.get_element_type(),
+        )
+
     def _both_attack(self) -> None:
         """handles the situation where both monsters attack
         Faster monster attacks first, then the other monster attacks if its still alive after being attacked
@@ -139,6 +169,11 @@ class Battle:
         Complexity: O(Comp(_compute_damage))"""
         effective_damage = self._compute_damage(attacking_monster, defending_monster)
         defending_monster.set_hp(defending_monster.get_hp() - effective_damage)
+        if self.log is not None:
+            multiplier = self._get_effectiveness(attacking_monster, defending_monster)
+            team_number = 1 if attacking_monster is self.out1 else 2
+            self.log.record(self.turn_number, EventType.DAMAGE, team_number, attacking_monster.get_name(),
+                            defending_monster.get_name(), effective_damage, multiplier)
 
     def _end_turn(self):
         """Handlex possible outcomes after each team has made their turn
@@ -146,16 +181,22 @@ class Battle:
         if self.out1.alive() and self.out2.alive(): 
             self.out1.set_hp(self.out1.get_hp() - 1)
             self.out2.set_hp(self.out2.get_hp() - 1)
+
+        if self.log is not None:
+            if not self.out1.alive():
+                self.log.record(self.turn_number, EventType.FAINT, 1, self.out1.get_name())
+            if not self.out2.alive():
+                self.log.record(self.turn_number, EventType.FAINT, 2, self.out2.get_name())
         
         if self.out2.alive() and not self.out1.alive():
-            self.out2 = self.out2.level_up()
+            self.out2 = self._level_up(self.out2, 2)
             try:
                 self.out1 = self.team1.retrieve_from_team()
             except ValueError:
                 self.team1_dead = True
         
         elif self.out1.alive() and not self.out2.alive():
-            self.out1 = self.out1.level_up()
+            self.out1 = self._level_up(self.out1, 1)
             try:
                 self.out2 = self.team2.retrieve_from_team()
             except ValueError:
@@ -171,6 +212,23 @@ class Battle:
             except ValueError:
                 self.team2_dead = True
         
+    def _level_up(self, monster: MonsterBase, team_number: int) -> MonsterBase:
+        """Levels up a monster, logging the level up and counting any evolution in its team's element usage
+        Complexity: O(Comp(level_up))"""
+        levelled = monster.level_up()
+        if levelled is not monster:
+            (self.team1 if team_number == 1 else self.team2).record_evolution(levelled)
+        if self.log is not None:
+            self.log.record(self.turn_number, EventType.LEVEL_UP, team_number, monster.get_name(), amount=monster.get_level())
+            if levelled is not monster:
+                self.log.record(self.turn_number, EventType.EVOLVE, team_number, levelled.get_name(), monster.get_name(), levelled.get_level())
+        return levelled
+
+    def _team_number(self, team: MonsterTeam) -> int:
+        """Returns 1 or 2 for the given team
+        Complexity: O(1)"""
+        return 1 if team is self.team1 else 2
+
     def _check_for_win(self):
         """Checks if either team has no remaining monsters
         Complexity: O(1)"""
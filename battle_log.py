@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import json
+import struct
+from enum import auto
+from typing import IO, Iterator, Optional
+
+from base_enum import BaseEnum
+from helpers import get_all_monsters
+
+from data_structures.referential_array import ArrayR
+
+# (turn, event type value, team (1 or 2, 0 for neither), monster name, other monster name, amount, multiplier)
+Event = tuple[int, int, int, Optional[str], Optional[str], int, float]
+
+
+class EventType(BaseEnum):
+    """
+    Kinds of battle event, and what the fields of each event mean.
+
+    BATTLE_START: nothing
+    ACTION: monster chose the Battle.Action with value amount
+    SWAP, SPECIAL: monster was sent out in place of other
+    DAMAGE: monster hit other for amount damage, with effectiveness multiplier
+    FAINT: monster fainted
+    LEVEL_UP: monster reached level amount
+    EVOLVE: other evolved into monster at level amount
+    BATTLE_END: the battle ended with the Battle.Result with value amount
+    """
+
+    BATTLE_START = auto()
+    ACTION = auto()
+    SWAP = auto()
+    SPECIAL = auto()
+    DAMAGE = auto()
+    FAINT = auto()
+    LEVEL_UP = auto()
+    EVOLVE = auto()
+    BATTLE_END = auto()
+
+
+class JsonlEventWriter:
+    """Writes events as one JSON object per line"""
+
+    FIELDS = ("turn", "event", "team", "monster", "other", "amount", "multiplier")
+
+    def __init__(self, file: IO[str]) -> None:
+        self.file = file
+        self.event_names = {event.value: event.name for event in EventType}
+
+    def write(self, event: Event) -> None:
+        record = dict(zip(self.FIELDS, event))
+        record["event"] = self.event_names[record["event"]]
+        self.file.write(json.dumps(record) + "\n")
+
+
+class BinaryEventWriter:
+    """
+    Writes events as fixed size little endian records (see RECORD), with monsters stored as their
+    index in get_all_monsters() and -1 for no monster.
+    """
+
+    RECORD = struct.Struct("<IBBhhid")
+
+    def __init__(self, file: IO[bytes]) -> None:
+        self.file = file
+        self.monster_ids = {monster.get_name(): i for i, monster in enumerate(get_all_monsters())}
+
+    def write(self, event: Event) -> None:
+        turn, event_type, team, monster, other, amount, multiplier = event
+        self.file.write(self.RECORD.pack(
+            turn,
+            event_type,
+            team,
+            self.monster_ids.get(monster, -1),
+            self.monster_ids.get(other, -1),
+            amount,
+            multiplier,
+        ))
+
+    @classmethod
+    def read(cls, file: IO[bytes]) -> Iterator[tuple[int, int, int, int, int, int, float]]:
+        """Reads back records written by this writer"""
+        while True:
+            record = file.read(cls.RECORD.size)
+            if len(record) < cls.RECORD.size:
+                return
+            yield cls.RECORD.unpack(record)
+
+
+class BattleLog:
+    """
+    Records battle events as compact tuples in a preallocated ring buffer.
+
+    Once the buffer is full the oldest events are overwritten. If a writer is given,
+    each event is handed to it as it leaves the buffer, and flush() writes out the rest,
+    so a stream gets every event.
+    No strings are formatted while recording.
+
+    Usage:
+        log = BattleLog(1024)
+        Battle(log=log).battle(team1, team2)
+        for turn, event_type, team, monster, other, amount, multiplier in log:
+            ...
+    """
+
+    def __init__(self, capacity: int = 4096, writer: JsonlEventWriter | BinaryEventWriter | None = None) -> None:
+        """
+        Allocate the buffer.
+        Complexity: O(capacity)
+        """
+        self.events = ArrayR(capacity)
+        self.start = 0
+        self.length = 0
+        self.dropped = 0
+        self.writer = writer
+
+    def __len__(self) -> int:
+        """Number of events currently held. Complexity: O(1)"""
+        return self.length
+
+    def __iter__(self) -> Iterator[Event]:
+        """Iterates the held events from oldest to newest. Complexity: O(n)"""
+        for i in range(self.length):
+            yield self.events[(self.start + i) % len(self.events)]
+
+    def record(self, turn: int, event_type: EventType, team: int, monster: Optional[str] = None,
+               other: Optional[str] = None, amount: int = 0, multiplier: float = 0.0) -> None:
+        """
+        Records one event.
+        Complexity: O(1), plus Comp(writer.write) when the buffer is full
+        """
+        capacity = len(self.events)
+        if self.length == capacity:
+            if self.writer is not None:
+                self.writer.write(self.events[self.start])
+            else:
+                self.dropped += 1
+            self.events[self.start] = (turn, event_type.value, team, monster, other, amount, multiplier)
+            self.start = (self.start + 1) % capacity
+        else:
+            self.events[(self.start + self.length) % capacity] = (turn, event_type.value, team, monster, other, amount, multiplier)
+            self.length += 1
+
+    def flush(self) -> None:
+        """
+        Hands every held event to the writer, oldest first, and empties the buffer.
+        Complexity: O(n), where n is the number of held events
+        """
+        if self.writer is None:
+            raise ValueError("BattleLog has no writer to flush to")
+        for event in self:
+            self.writer.write(event)
+        self.clear()
+
+    def clear(self) -> None:
+        """Complexity: O(1)"""
+        self.start = 0
+        self.length = 0
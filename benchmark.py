@@ -0,0 +1,252 @@
+"""
+Benchmark suite for the battle, team, stats and tower hot paths.
+
+Every case runs from fixed seeds, so two runs on the same machine do the same work.
+Results are emitted as JSON and can be compared against a saved baseline.
+
+Usage:
+    python benchmark.py                          # Run everything, print JSON
+    python benchmark.py -o baseline.json         # Save the results
+    python benchmark.py --compare baseline.json  # Compare against a saved run
+    python benchmark.py --filter battle --repeat 3
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Callable
+
+from random_gen import RandomStream
+from helpers import get_all_monsters, get_monster_registry, CATALOG_FILE
+from team import MonsterTeam
+from battle import Battle
+from tower import BattleTower
+
+from data_structures.referential_array import ArrayR
+
+SEED = 1008
+
+
+class Case:
+    """
+    A single benchmark.
+
+    setup() builds fresh, untimed state for every repeat, run(state) is the timed part.
+    operations is the amount of work one run does, used to report a rate.
+    When that is only known after running, operations is None and run returns the count instead.
+    """
+
+    def __init__(self, name: str, setup: Callable[[], Any], run: Callable[[Any], Any], operations: int | None) -> None:
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.operations = operations
+
+    def measure(self, repeat: int) -> dict:
+        """
+        Runs the case `repeat` times and returns its timings.
+        Complexity: O(repeat * (Comp(setup) + Comp(run)))
+        """
+        timings = []
+        operations = self.operations
+        for _ in range(repeat):
+            state = self.setup()
+            start = time.perf_counter()
+            done = self.run(state)
+            timings.append(time.perf_counter() - start)
+            if self.operations is None:
+                operations = done
+        best = min(timings)
+        return {
+            "best_s": best,
+            "median_s": statistics.median(timings),
+            "repeat": repeat,
+            "operations": operations,
+            "operations_per_s": operations / best if best > 0 else None,
+        }
+
+
+def _make_team(team_mode: MonsterTeam.TeamMode, rng: RandomStream) -> MonsterTeam:
+    """A random team in the given mode, OPTIMISE teams are sorted by HP"""
+    kwargs = {"sort_key": MonsterTeam.SortMode.HP} if team_mode == MonsterTeam.TeamMode.OPTIMISE else {}
+    return MonsterTeam(team_mode, MonsterTeam.SelectionMode.RANDOM, rng=rng, **kwargs)
+
+
+def _random_pairs(n: int) -> list:
+    """n seeded pairs of monster instances"""
+    rng = RandomStream(SEED)
+    monsters = get_all_monsters()
+    return [(rng.random_choice(monsters)(), rng.random_choice(monsters)()) for _ in range(n)]
+
+
+def _compute_damage_case(n: int) -> Case:
+    def run(state):
+        battle, pairs = state
+        for attacker, defender in pairs:
+            battle._compute_damage(attacker, defender)
+    return Case("micro.compute_damage", lambda: (Battle(), _random_pairs(n)), run, n)
+
+
+def _complex_stats_case(levels: int) -> Case:
+    def run(state):
+        for stats in state:
+            for level in range(1, levels + 1):
+                stats._calculate(stats.attack_formula, level)
+                stats._calculate(stats.defense_formula, level)
+                stats._calculate(stats.speed_formula, level)
+                stats._calculate(stats.max_hp_formula, level)
+    monsters = get_all_monsters()
+    setup = lambda: [monster.get_complex_stats() for monster in monsters]
+    return Case("micro.complex_stats", setup, run, len(monsters) * levels * 4)
+
+
+def _add_retrieve_case(team_mode: MonsterTeam.TeamMode, n: int) -> Case:
+    def run(team):
+        for _ in range(n):
+            team.add_to_team(team.retrieve_from_team())
+    setup = lambda: _make_team(team_mode, RandomStream(SEED))
+    return Case(f"micro.add_retrieve.{team_mode.name.lower()}", setup, run, n)
+
+
+def _battles_case(team_mode: MonsterTeam.TeamMode, n: int) -> Case:
+    def setup():
+        rng = RandomStream(SEED)
+        return [(_make_team(team_mode, rng), _make_team(team_mode, rng)) for _ in range(n)]
+
+    def run(pairs):
+        for team1, team2 in pairs:
+            Battle(verbosity=0).battle(team1, team2)
+    return Case(f"macro.battles.{team_mode.name.lower()}", setup, run, n)
+
+
+def _tower_case(n: int) -> Case:
+    """
+    A tower of n enemy teams, reporting battles fought per second.
+    Battles between the same two teams always end the same way, so a user team that loses to one enemy
+    would fight it until its lives ran out. The user team is six of the strongest spawnable monster
+    with as many lives as all the enemies together, which fights the whole tower for SEED.
+    The rate is from the battles actually fought, so it stays comparable across tower sizes either way.
+    """
+    def setup():
+        tower = BattleTower(rng=RandomStream(SEED))
+        strongest = max(get_monster_registry().get_spawnable(), key=_simple_stats_total)
+        tower.set_my_team(MonsterTeam(MonsterTeam.TeamMode.BACK, MonsterTeam.SelectionMode.PROVIDED,
+                                      provided_monsters=ArrayR.from_list([strongest] * MonsterTeam.TEAM_LIMIT)))
+        tower.generate_teams(n)
+        tower.user_lives = tower.enemy_lives_total
+        return tower
+
+    def run(tower):
+        while tower.battles_remaining():
+            tower.next_battle()
+        return tower.battles_fought
+    return Case(f"macro.tower.{n}", setup, run, None)
+
+
+def _simple_stats_total(monster: type) -> int:
+    stats = monster.get_simple_stats()
+    return stats.get_attack() + stats.get_defense() + stats.get_speed() + stats.get_max_hp()
+
+
+def _startup_case(cold: bool) -> Case:
+    def setup():
+        if cold and os.path.exists(CATALOG_FILE):
+            os.remove(CATALOG_FILE)
+
+    def run(_):
+        subprocess.run([sys.executable, "-c", "import helpers; helpers.get_all_monsters()"], check=True)
+    return Case(f"startup.import_{'cold' if cold else 'warm'}", setup, run, 1)
+
+
+def all_cases() -> list[Case]:
+    """Every benchmark case, in the order they are run"""
+    cases = [
+        _compute_damage_case(10_000),
+        _complex_stats_case(20),
+    ]
+    for team_mode in MonsterTeam.TeamMode:
+        cases.append(_add_retrieve_case(team_mode, 10_000))
+    for team_mode in MonsterTeam.TeamMode:
+        cases.append(_battles_case(team_mode, 500))
+    for n in (10, 100, 1000):
+        cases.append(_tower_case(n))
+    cases.append(_startup_case(cold=True))
+    cases.append(_startup_case(cold=False))
+    return cases
+
+
+def run_benchmarks(repeat: int, name_filter: str | None = None) -> dict:
+    """
+    Runs every matching case. A failing case is recorded with its error rather than stopping the suite.
+    Complexity: O(sum of Comp(Case.measure))
+    """
+    results = {}
+    for case in all_cases():
+        if name_filter and name_filter not in case.name:
+            continue
+        try:
+            results[case.name] = case.measure(repeat)
+        except Exception as e:
+            results[case.name] = {"error": f"{type(e).__name__}: {e}"}
+        print(f"{case.name}: {results[case.name]}", file=sys.stderr)
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": SEED,
+        "cases": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> bool:
+    """
+    Prints the change in best time of every case present in both runs.
+    Returns whether any case got slower by more than `threshold` (a fraction).
+    """
+    regressed = False
+    for name, result in current["cases"].items():
+        old = baseline["cases"].get(name)
+        if old is None or "error" in old or "error" in result:
+            print(f"{name:32} skipped")
+            continue
+        ratio = result["best_s"] / old["best_s"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressed = True
+        elif ratio < 1 - threshold:
+            flag = "  improvement"
+        print(f"{name:32} {old['best_s']:.6f}s -> {result['best_s']:.6f}s ({ratio:.2f}x){flag}")
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-o", "--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Slowdown treated as a regression (default 0.1)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per case, the best is reported (default 5)")
+    parser.add_argument("--filter", help="Only run cases whose name contains this string")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.repeat, args.filter)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+import pickle
+from typing import Iterable
+
+from elements import EffectivenessCalculator
+from helpers import MONSTERS_FILE, get_all_monsters
+from monster_base import MonsterBase
+
+EFFECTIVENESS_FILE = "type_effectiveness.csv"
+DAMAGE_TABLE_FILE = "damage.table.pickle"
+DAMAGE_TABLE_VERSION = 2
+
+# (attacker name, attacker level, attacker simple mode, defender name, defender level, defender simple mode)
+DamageKey = tuple[str, int, bool, str, int, bool]
+
+
+def compute_damage(attacking_monster: MonsterBase, defending_monster: MonsterBase) -> int:
+    """Calculates the effective damage for the attacking monster on the defending monster based on their stats and elements
+    Complexity: O(Comp(get_effectiveness))"""
+    attack = attacking_monster.get_attack()
+    defense = defending_monster.get_defense()
+
+    if defense < attack / 2:
+        damage = attack - defense
+    elif defense < attack:
+        damage = attack * 5/8 - defense / 4
+    else:
+        damage = attack / 4
+
+    damage_multiplier = EffectivenessCalculator.get_effectiveness(
+        attacking_monster.get_element_type(), defending_monster.get_element_type()
+    )
+    return math.ceil(damage * damage_multiplier)
+
+
+def source_fingerprint() -> str:
+    """sha256 over monsters.yaml and type_effectiveness.csv, the only inputs to damage besides the monsters' levels"""
+    digest = hashlib.sha256()
+    for file_name in (MONSTERS_FILE, EFFECTIVENESS_FILE):
+        with open(file_name, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class DamageTable:
+    """
+    Memo of the damage one monster deals another, filled lazily as battles run or up front with precompute.
+
+    Damage only depends on the two monsters' classes, stat modes and levels. Simple stats do not depend on the
+    level, so simple mode monsters share one entry per class whatever their level.
+    A saved table stores the fingerprint of monsters.yaml and type_effectiveness.csv, and load
+    discards it once either file changes, so the table is rebuilt from the current data.
+
+    Usage:
+        table = DamageTable.load()
+        Battle(damage_table=table).battle(team1, team2)
+        table.save()
+    """
+
+    def __init__(self, fingerprint: str | None = None) -> None:
+        self.fingerprint = fingerprint or source_fingerprint()
+        self.damage: dict[DamageKey, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.damage)
+
+    def compute_damage(self, attacking_monster: MonsterBase, defending_monster: MonsterBase) -> int:
+        """
+        Same result as damage_table.compute_damage, from the memo where possible.
+        Complexity: O(1) for a filled entry, O(Comp(compute_damage)) otherwise
+        """
+        attacker_simple = attacking_monster.simple_mode
+        defender_simple = defending_monster.simple_mode
+        key = (
+            attacking_monster.get_name(), 0 if attacker_simple else attacking_monster.level, attacker_simple,
+            defending_monster.get_name(), 0 if defender_simple else defending_monster.level, defender_simple,
+        )
+        try:
+            return self.damage[key]
+        except KeyError:
+            damage = self.damage[key] = compute_damage(attacking_monster, defending_monster)
+            return damage
+
+    def precompute(self, levels: Iterable[int] = (1,), simple_mode: bool = True) -> None:
+        """
+        Fills the table for every pair of monsters at every pair of the given levels.
+        In simple mode the levels make no difference, so one level is enough.
+        Complexity: O(m^2 * l^2 * Comp(compute_damage)), where m is the number of monsters and l the number of levels
+        """
+        monsters = [monster(simple_mode=simple_mode, level=level) for level in levels for monster in get_all_monsters()]
+        for attacker in monsters:
+            for defender in monsters:
+                self.compute_damage(attacker, defender)
+
+    def is_stale(self) -> bool:
+        """Whether monsters.yaml or type_effectiveness.csv changed since the table was built"""
+        return self.fingerprint != source_fingerprint()
+
+    def save(self, path: str = DAMAGE_TABLE_FILE) -> None:
+        """Writes the table atomically, so concurrent readers never see a partial file"""
+        temp_file = f"{path}.{os.getpid()}.tmp"
+        with open(temp_file, "wb") as f:
+            pickle.dump({"version": DAMAGE_TABLE_VERSION, "fingerprint": self.fingerprint, "damage": self.damage},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file, path)
+
+    @classmethod
+    def load(cls, path: str = DAMAGE_TABLE_FILE, fingerprint: str | None = None) -> DamageTable:
+        """
+        Loads a saved table, or returns an empty one if there is none or the data files have changed since.
+        Pass the source_fingerprint of the data files if it is already known, so they are not hashed again.
+        """
+        table = cls(fingerprint)
+        try:
+            with open(path, "rb") as f:
+                saved = pickle.load(f)
+            if saved["version"] == DAMAGE_TABLE_VERSION and saved["fingerprint"] == table.fingerprint:
+                table.damage = saved["damage"]
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError, TypeError):
+            pass
+        return table
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+from array import array
 from enum import auto
 from typing import Optional
 
 from base_enum import BaseEnum
+from shared_tables import EFFECTIVENESS_ENV, attach
 
 from data_structures.referential_array import ArrayR
 
@@ -33,10 +35,28 @@ class Element(BaseEnum):
 
     @classmethod
     def from_string(cls, string: str) -> Element:
-        for elem in Element:
-            if elem.name.lower() == string.lower():
-                return elem
-        raise ValueError(f"Unexpected string {string}")
+        """
+        Complexity: O(1), the string is only lowercased if it is not spelt like the name or in title case
+        """
+        try:
+            return _ELEMENTS_BY_NAME[string]
+        except KeyError:
+            pass
+        try:
+            return _ELEMENTS_BY_NAME[string.lower()]
+        except KeyError:
+            raise ValueError(f"Unexpected string {string}") from None
+
+    def index(self) -> int:
+        """Position of the element in the effectiveness table. Complexity: O(1)"""
+        return self.value - 1
+
+# Element is unhashable (see BaseEnum), so elements are looked up by name instead.
+_ELEMENTS_BY_NAME: dict[str, Element] = {}
+for _elem in Element:
+    for _spelling in (_elem.name, _elem.name.lower(), _elem.name.title()):
+        _ELEMENTS_BY_NAME[_spelling] = _elem
+del _elem, _spelling
 
 class EffectivenessCalculator:
     """
@@ -54,8 +74,11 @@ class EffectivenessCalculator:
         """
         Initialise the Effectiveness Calculator.
 
+        The csv rows are reordered into a dense table indexed by Element ordinal,
+        so lookups never need to search for an element.
+
         Complexity:
-        Best/Worst: O(n x Comp(from_string))
+        Best/Worst: O(n^2 + n x Comp(from_string))
         Where n is the number of elements in element_names
         """
         self.element_names = element_names
@@ -64,19 +87,41 @@ class EffectivenessCalculator:
         for i, elem in enumerate(element_names):
             self.elements_array[i] = Element.from_string(elem)
 
+        self.element_count = len(Element)
+        self.effectiveness_table = array("d", [1.0]) * (self.element_count * self.element_count)
+        n = len(element_names)
+        for i in range(n):
+            row = (self.elements_array[i].value - 1) * self.element_count
+            for j in range(n):
+                self.effectiveness_table[row + self.elements_array[j].value - 1] = effectiveness_values[i * n + j]
 
     @classmethod
     def get_effectiveness(cls, type1: Element, type2: Element) -> float:
         """
         Returns the effectivness of elem1 attacking elem2.
         Complexity:
+        Best/Worst: O(1)
+        """
+        instance = cls.instance
+        return instance.effectiveness_table[(type1.value - 1) * instance.element_count + type2.value - 1]
+
+    @classmethod
+    def get_effectiveness_many(cls, attackers: ArrayR[Element], defenders: ArrayR[Element]) -> array:
+        """
+        Returns the effectiveness of attackers[i] attacking defenders[i] for every i.
+        Complexity:
         Best/Worst: O(n)
-        Where n is the number of elements in effectiveness_values
+        Where n is the number of attacker/defender pairs
         """
-        index1 = cls.instance.elements_array.index(type1)
-        index2 = cls.instance.elements_array.index(type2)
-        return cls.instance.effectivness_values[index1 * len(cls.instance.element_names) + index2]
-        
+        if len(attackers) != len(defenders):
+            raise ValueError("attackers and defenders must be the same length")
+        instance = cls.instance
+        table = instance.effectiveness_table
+        count = instance.element_count
+        result = array("d", bytes(8 * len(attackers)))
+        for i in range(len(attackers)):
+            result[i] = table[(attackers[i].value - 1) * count + defenders[i].value - 1]
+        return result
 
         
     @classmethod
@@ -95,9 +140,28 @@ class EffectivenessCalculator:
                 a_all[i] = float(rest[i])
             return EffectivenessCalculator(a_header, a_all)
 
+    @classmethod
+    def from_table(cls, effectiveness_table: array | memoryview) -> EffectivenessCalculator:
+        """
+        Wraps an existing dense table, indexed by Element ordinal, without copying it.
+        Complexity: O(1)
+        """
+        instance = cls.__new__(cls)
+        instance.element_names = None
+        instance.effectivness_values = None
+        instance.elements_array = None
+        instance.element_count = len(Element)
+        instance.effectiveness_table = effectiveness_table
+        return instance
+
     @classmethod
     def make_singleton(cls):
-        cls.instance = EffectivenessCalculator.from_csv("type_effectiveness.csv")
+        # Worker processes use the table their parent published, see shared_tables.
+        shared = attach(EFFECTIVENESS_ENV)
+        if shared is not None:
+            cls.instance = EffectivenessCalculator.from_table(shared.cast("d"))
+        else:
+            cls.instance = EffectivenessCalculator.from_csv("type_effectiveness.csv")
 
 EffectivenessCalculator.make_singleton()
 
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from typing import Generic, TypeVar
+
+from data_structures.referential_array import ArrayR
+
+T = TypeVar("T")
+
+
+class GrowableStack(Generic[T]):
+    """
+    Array based stack with the same interface as ArrayStack, whose array doubles when full
+    instead of raising. Push is O(1) amortised, every other method is O(1).
+    """
+
+    MIN_CAPACITY = 1
+
+    def __init__(self, initial_capacity: int) -> None:
+        self.length = 0
+        self.array = ArrayR(max(self.MIN_CAPACITY, initial_capacity))
+
+    def __len__(self) -> int:
+        return self.length
+
+    def is_empty(self) -> bool:
+        return self.length == 0
+
+    def is_full(self) -> bool:
+        """A growable stack is never full"""
+        return False
+
+    def clear(self) -> None:
+        self.length = 0
+
+    def push(self, item: T) -> None:
+        """Pushes an element to the top of the stack, growing the array if needed"""
+        if self.length == len(self.array):
+            new_array = ArrayR(2 * len(self.array))
+            for i in range(self.length):
+                new_array[i] = self.array[i]
+            self.array = new_array
+        self.array[self.length] = item
+        self.length += 1
+
+    def pop(self) -> T:
+        """Pops the element at the top of the stack"""
+        if self.is_empty():
+            raise Exception("Stack is empty")
+        self.length -= 1
+        return self.array[self.length]
+
+    def peek(self) -> T:
+        """Returns the element at the top, without popping it from stack"""
+        if self.is_empty():
+            raise Exception("Stack is empty")
+        return self.array[self.length - 1]
+
+
+class GrowableQueue(Generic[T]):
+    """
+    Circular array queue with the same interface as CircularQueue, whose array doubles when full
+    instead of raising. Append is O(1) amortised, every other method is O(1).
+    """
+
+    MIN_CAPACITY = 1
+
+    def __init__(self, initial_capacity: int) -> None:
+        self.length = 0
+        self.front = 0
+        self.rear = 0
+        self.array = ArrayR(max(self.MIN_CAPACITY, initial_capacity))
+
+    def __len__(self) -> int:
+        return self.length
+
+    def is_empty(self) -> bool:
+        return self.length == 0
+
+    def is_full(self) -> bool:
+        """A growable queue is never full"""
+        return False
+
+    def clear(self) -> None:
+        self.front = 0
+        self.rear = 0
+        self.length = 0
+
+    def append(self, item: T) -> None:
+        """Adds an element to the rear of the queue, growing the array if needed"""
+        if self.length == len(self.array):
+            self._resize()
+        self.array[self.rear] = item
+        self.length += 1
+        self.rear = (self.rear + 1) % len(self.array)
+
+    def serve(self) -> T:
+        """Deletes an element from the front of the queue"""
+        if self.is_empty():
+            raise Exception("Queue is empty")
+        self.length -= 1
+        item = self.array[self.front]
+        self.front = (self.front + 1) % len(self.array)
+        return item
+
+    def peek(self) -> T:
+        """Returns the element at the front of the queue, without removing it"""
+        if self.is_empty():
+            raise Exception("Queue is empty")
+        return self.array[self.front]
+
+    def _resize(self) -> None:
+        """Doubles the array, unrolling the queue so it starts at index 0"""
+        new_array = ArrayR(2 * len(self.array))
+        for i in range(self.length):
+            new_array[i] = self.array[(self.front + i) % len(self.array)]
+        self.array = new_array
+        self.front = 0
+        self.rear = self.length
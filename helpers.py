@@ -1,39 +1,190 @@
 from __future__ import annotations
-import yaml
-from typing import TYPE_CHECKING
+import hashlib
+import os
+import pickle
+from typing import Optional, TYPE_CHECKING
 
 from data_structures.referential_array import ArrayR
+from shared_tables import CATALOG_ENV, attach
 
 if TYPE_CHECKING:
     from monster_base import MonsterBase
+    from elements import Element
 
 
+MONSTERS_FILE = "monsters.yaml"
+CATALOG_FILE = "monsters.catalog.pickle"
+CATALOG_VERSION = 2
+
 _monsters: ArrayR[MonsterBase] = None
+_registry: MonsterRegistry = None
 
 
 def MonsterBaseFactory(name, description, evolution, element, simple_stats, complex_stats, can_be_spawned) -> type[MonsterBase]:
     from monster_base import MonsterBase
+    from elements import Element
+    element_type = Element.from_string(element)
+    element_index = element_type.index()
     return type(name, (MonsterBase, ), {
+        # Keep instances slotted, no per monster __dict__.
+        "__slots__": (),
         "get_name": classmethod(lambda s: name),
         "get_description": classmethod(lambda s: description),
         # This will be defined later when we have all names.
         "get_evolution": classmethod(lambda s: None),
         "get_element": classmethod(lambda s: element),
+        # Resolved once here, so battles never parse the element string.
+        "get_element_type": classmethod(lambda s: element_type),
+        "get_element_index": classmethod(lambda s: element_index),
         "get_simple_stats": classmethod(lambda s: simple_stats),
         "get_complex_stats": classmethod(lambda s: complex_stats),
         "can_be_spawned": classmethod(lambda s: can_be_spawned),
     })
 
+class MonsterRegistry:
+    """
+    Indexes over every monster class, built once alongside get_all_monsters().
+
+    Usage:
+        registry = get_monster_registry()
+        registry.get_by_name("Flamikin")
+        registry.get_by_element(Element.FIRE)
+    """
+
+    def __init__(self, monsters: ArrayR[type[MonsterBase]]) -> None:
+        """
+        Build the indexes.
+        Complexity: O(n), where n is the number of monster classes
+        """
+        self.monsters = monsters
+        self._by_name: dict[str, type[MonsterBase]] = {}
+        # Element is unhashable (see BaseEnum), so elements are keyed by their value.
+        self._by_element: dict[int, list[type[MonsterBase]]] = {}
+        self._pre_evolution: dict[str, type[MonsterBase]] = {}
+        spawnable = []
+        for monster in monsters:
+            self._by_name[monster.get_name()] = monster
+            self._by_element.setdefault(monster.get_element_type().value, []).append(monster)
+            if monster.can_be_spawned():
+                spawnable.append(monster)
+            evolution = monster.get_evolution()
+            if evolution is not None:
+                self._pre_evolution[evolution.get_name()] = monster
+        self._spawnable = tuple(spawnable)
+        self._element_groups = {value: tuple(group) for value, group in self._by_element.items()}
+
+    def __len__(self) -> int:
+        """Number of monster classes. Complexity: O(1)"""
+        return len(self.monsters)
+
+    def __contains__(self, name: str) -> bool:
+        """Whether a monster class with this name exists. Complexity: O(1)"""
+        return name in self._by_name
+
+    def get_by_name(self, name: str) -> type[MonsterBase]:
+        """
+        Returns the monster class with the given name.
+        Complexity: O(1)
+        """
+        try:
+            return self._by_name[name]
+        except KeyError:
+            raise ValueError(f"No monster named {name}")
+
+    def get_by_element(self, element: Element) -> tuple[type[MonsterBase], ...]:
+        """
+        Returns every monster class of the given element, in catalog order.
+        Complexity: O(1)
+        """
+        return self._element_groups.get(element.value, ())
+
+    def get_spawnable(self) -> tuple[type[MonsterBase], ...]:
+        """
+        Returns every monster class that can be spawned, in catalog order.
+        Complexity: O(1)
+        """
+        return self._spawnable
+
+    def get_pre_evolution(self, monster: type[MonsterBase]) -> Optional[type[MonsterBase]]:
+        """
+        Returns the monster class that evolves into this one, if any.
+        Complexity: O(1)
+        """
+        return self._pre_evolution.get(monster.get_name())
+
+    def get_evolution_chain(self, monster: type[MonsterBase]) -> tuple[type[MonsterBase], ...]:
+        """
+        Returns the full evolution line containing this monster, from its base form to its final form.
+        Complexity: O(k), where k is the length of the evolution line
+        """
+        base = monster
+        while self.get_pre_evolution(base) is not None:
+            base = self.get_pre_evolution(base)
+        chain = []
+        while base is not None:
+            chain.append(base)
+            base = base.get_evolution()
+        return tuple(chain)
+
+
 def get_all_monsters():
     if _monsters is None:
         _make_all_monster_classes()
     return _monsters
 
+def get_monster_registry() -> MonsterRegistry:
+    if _registry is None:
+        _make_all_monster_classes()
+    return _registry
+
+def _load_monster_data() -> list[dict]:
+    """
+    Returns the parsed contents of monsters.yaml.
+
+    Parsing the yaml is the slow part of startup, so the parsed data is pickled to CATALOG_FILE,
+    keyed by the yaml's mtime, size and sha256. The pickle is reused while the mtime and size match,
+    and the yaml is only read and hashed when they change, so touching the file does not force a parse.
+    Worker processes read the catalog their parent published instead, see shared_tables.
+    """
+    shared = attach(CATALOG_ENV)
+    if shared is not None:
+        return pickle.loads(shared)
+    stat = os.stat(MONSTERS_FILE)
+    catalog = None
+    try:
+        with open(CATALOG_FILE, "rb") as f:
+            catalog = pickle.load(f)
+        if catalog["version"] != CATALOG_VERSION:
+            catalog = None
+        elif catalog["mtime"] == stat.st_mtime_ns and catalog["size"] == stat.st_size:
+            return catalog["monsters"]
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError, TypeError):
+        catalog = None
+
+    with open(MONSTERS_FILE, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).hexdigest()
+    if catalog is not None and catalog.get("sha256") == digest:
+        monsters_yaml = catalog["monsters"]
+    else:
+        import yaml
+        monsters_yaml = yaml.safe_load(raw)
+    catalog = {"version": CATALOG_VERSION, "mtime": stat.st_mtime_ns, "size": stat.st_size, "sha256": digest,
+               "monsters": monsters_yaml}
+    try:
+        temp_file = f"{CATALOG_FILE}.{os.getpid()}.tmp"
+        with open(temp_file, "wb") as f:
+            pickle.dump(catalog, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file, CATALOG_FILE)
+    except OSError:
+        # The cache is only an optimisation, a read only checkout still works.
+        pass
+    return monsters_yaml
+
 def _make_all_monster_classes():
     from stats import SimpleStats, ComplexStats
-    global _monsters
-    with open("monsters.yaml", "r") as f:
-        monsters_yaml = yaml.safe_load(f)
+    global _monsters, _registry
+    monsters_yaml = _load_monster_data()
     _monsters = ArrayR(len(monsters_yaml))
     idx = 0
     for monster in monsters_yaml:
@@ -64,8 +215,18 @@ def _make_all_monster_classes():
         evolution_class = globals()[evolution]
         globals()[monster["name"]].evolution_class = evolution_class
         globals()[monster["name"]].get_evolution = classmethod(lambda s: s.evolution_class)
+    _registry = MonsterRegistry(_monsters)
 
-get_all_monsters()
+def __getattr__(name: str):
+    """
+    Monster classes are created lazily, so importing helpers does no I/O.
+    The first access to a monster class by name (e.g. `from helpers import Flamikin`) loads them all.
+    """
+    if _monsters is None and not name.startswith("__"):
+        _make_all_monster_classes()
+        if name in globals():
+            return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if TYPE_CHECKING:
     # Makes no sense but fixes the red squigglies
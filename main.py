@@ -1,5 +1,5 @@
 from random_gen import RandomGen
-from helpers import get_all_monsters
+from helpers import get_monster_registry
 from team import MonsterTeam
 from battle import Battle
 
@@ -9,18 +9,18 @@ def main():
     RandomGen.set_seed(42)
 
     # Load all available monsters
-    all_monsters = get_all_monsters()
+    registry = get_monster_registry()
 
     # Dynamically select monsters for two teams by name
     team1_monster_names = ["Flamikin", "Aquariuma", "Vineon"]
-    team2_monster_names = ["Strikeon", "Normake", "Marititan"]
+    team2_monster_names = ["Strikeon", "Rockodile", "Shadowcat"]
 
-    team1_monsters = [next(m() for m in all_monsters if m.get_name() == name) for name in team1_monster_names]
-    team2_monsters = [next(m() for m in all_monsters if m.get_name() == name) for name in team2_monster_names]
+    team1_monsters = [registry.get_by_name(name) for name in team1_monster_names]
+    team2_monsters = [registry.get_by_name(name) for name in team2_monster_names]
 
     # Create teams with the selected monsters
-    team1 = MonsterTeam(TeamMode.PROVIDED, SelectionMode.PROVIDED, provided_monsters=team1_monsters)
-    team2 = MonsterTeam(TeamMode.PROVIDED, SelectionMode.PROVIDED, provided_monsters=team2_monsters)
+    team1 = MonsterTeam(MonsterTeam.TeamMode.FRONT, MonsterTeam.SelectionMode.PROVIDED, provided_monsters=team1_monsters)
+    team2 = MonsterTeam(MonsterTeam.TeamMode.FRONT, MonsterTeam.SelectionMode.PROVIDED, provided_monsters=team2_monsters)
 
     # Create and start a battle instance
     battle = Battle(verbosity=1)
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+from typing import Generic, TypeVar
+
+from data_structures.referential_array import ArrayR
+from data_structures.sorted_list_adt import ListItem
+
+T = TypeVar("T")
+
+
+class MinMaxHeap(Generic[T]):
+    """
+    Double ended priority queue of ListItems, ordered by their key.
+
+    Even depths of the tree are min levels and odd depths are max levels, so both the
+    smallest and the largest item can be found in O(1) and removed in O(log n).
+    The backing array doubles in size when full.
+
+    Usage:
+        heap = MinMaxHeap(6)
+        heap.add(ListItem(monster, key))
+        heap.delete_min().value
+        heap.delete_max().value
+    """
+
+    MIN_CAPACITY = 1
+
+    def __init__(self, max_capacity: int) -> None:
+        """
+        Create an empty heap.
+        Complexity: O(max_capacity)
+        """
+        self.length = 0
+        self.array = ArrayR(max(self.MIN_CAPACITY, max_capacity))
+
+    def __len__(self) -> int:
+        """Number of items in the heap. Complexity: O(1)"""
+        return self.length
+
+    def __getitem__(self, index: int) -> ListItem:
+        """
+        Returns the item stored at this position of the heap array (not in key order).
+        Adding the items back in index order rebuilds the same heap.
+        Complexity: O(1)
+        """
+        if not 0 <= index < self.length:
+            raise IndexError("Heap index out of range")
+        return self.array[index]
+
+    def is_empty(self) -> bool:
+        """Complexity: O(1)"""
+        return self.length == 0
+
+    def clear(self) -> None:
+        """Complexity: O(1)"""
+        self.length = 0
+
+    def add(self, item: ListItem) -> None:
+        """
+        Add an item to the heap.
+        Complexity: O(log n) amortised, where n is the number of items
+        """
+        if self.length == len(self.array):
+            self._resize()
+        self.array[self.length] = item
+        self.length += 1
+        self._bubble_up(self.length - 1)
+
+    def peek_min(self) -> ListItem:
+        """Complexity: O(1)"""
+        if self.is_empty():
+            raise IndexError("Heap is empty")
+        return self.array[0]
+
+    def peek_max(self) -> ListItem:
+        """Complexity: O(1)"""
+        return self.array[self._max_index()]
+
+    def delete_min(self) -> ListItem:
+        """
+        Remove and return the item with the smallest key.
+        Complexity: O(log n), where n is the number of items
+        """
+        if self.is_empty():
+            raise IndexError("Heap is empty")
+        return self._delete_at(0)
+
+    def delete_max(self) -> ListItem:
+        """
+        Remove and return the item with the largest key.
+        Complexity: O(log n), where n is the number of items
+        """
+        return self._delete_at(self._max_index())
+
+    def _max_index(self) -> int:
+        """The largest item is the root or one of its children"""
+        if self.is_empty():
+            raise IndexError("Heap is empty")
+        if self.length == 1:
+            return 0
+        if self.length == 2 or self.array[1].key >= self.array[2].key:
+            return 1
+        return 2
+
+    def _delete_at(self, index: int) -> ListItem:
+        """Removes the item at index, which must be the root or the max of its children"""
+        item = self.array[index]
+        self.length -= 1
+        if index < self.length:
+            self.array[index] = self.array[self.length]
+            self._trickle_down(index)
+        return item
+
+    def _resize(self) -> None:
+        new_array = ArrayR(2 * len(self.array))
+        for i in range(self.length):
+            new_array[i] = self.array[i]
+        self.array = new_array
+
+    @staticmethod
+    def _is_min_level(index: int) -> bool:
+        return (index + 1).bit_length() % 2 == 1
+
+    def _swap(self, i: int, j: int) -> None:
+        self.array[i], self.array[j] = self.array[j], self.array[i]
+
+    def _bubble_up(self, index: int) -> None:
+        if index == 0:
+            return
+        parent = (index - 1) // 2
+        if self._is_min_level(index):
+            if self.array[index].key > self.array[parent].key:
+                self._swap(index, parent)
+                self._bubble_up_towards(parent, is_max=True)
+            else:
+                self._bubble_up_towards(index, is_max=False)
+        else:
+            if self.array[index].key < self.array[parent].key:
+                self._swap(index, parent)
+                self._bubble_up_towards(parent, is_max=False)
+            else:
+                self._bubble_up_towards(index, is_max=True)
+
+    def _bubble_up_towards(self, index: int, is_max: bool) -> None:
+        """Moves an item up through its grandparents, which are on the same kind of level"""
+        while index > 2:
+            grandparent = ((index - 1) // 2 - 1) // 2
+            key, grand_key = self.array[index].key, self.array[grandparent].key
+            if (key > grand_key) if is_max else (key < grand_key):
+                self._swap(index, grandparent)
+                index = grandparent
+            else:
+                break
+
+    def _trickle_down(self, index: int) -> None:
+        is_max = not self._is_min_level(index)
+        while True:
+            first_child = 2 * index + 1
+            if first_child >= self.length:
+                return
+            # The most extreme of the children and grandchildren
+            best = first_child
+            for candidate in (first_child + 1, 4 * index + 3, 4 * index + 4, 4 * index + 5, 4 * index + 6):
+                if candidate < self.length and self._more_extreme(candidate, best, is_max):
+                    best = candidate
+            if not self._more_extreme(best, index, is_max):
+                return
+            self._swap(best, index)
+            if best <= first_child + 1:
+                return
+            parent = (best - 1) // 2
+            if self._more_extreme(parent, best, is_max):
+                self._swap(best, parent)
+            index = best
+
+    def _more_extreme(self, i: int, j: int, is_max: bool) -> bool:
+        if is_max:
+            return self.array[i].key > self.array[j].key
+        return self.array[i].key < self.array[j].key
@@ -3,9 +3,15 @@ import abc
 
 
 from stats import Stats
+from elements import Element
 
 class MonsterBase(abc.ABC):
 
+    __slots__ = ("simple_mode", "level", "start_level", "hp", "attack_stat", "defense_stat", "speed_stat", "max_hp_stat")
+
+    # Number of _refresh_stats calls in this process, read by BattleProfiler before and after each battle.
+    stats_refreshed = 0
+
     def __init__(self, simple_mode: bool=True, level: int=1) -> None:
         """
         Initialise an instance of a monster.
@@ -14,10 +20,12 @@ class MonsterBase(abc.ABC):
         :level: The starting level of this monster. Defaults to 1.
         :start_level: The starting level of this monster, used to check qualifification for evolutions.
         :hp: The current hit points of this monster
+        :attack_stat, defense_stat, speed_stat, max_hp_stat: Stats for the current level, see _refresh_stats
         """
         self.simple_mode = simple_mode
         self.level = level
         self.start_level = level
+        self._refresh_stats()
         self.hp = self.get_max_hp()
 
     def __str__(self) -> str:
@@ -30,7 +38,27 @@ class MonsterBase(abc.ABC):
     
     def _get_stats_mode(self) -> Stats:
         """Internal method which returns the stats mode (simple or complex)"""
-        return self.get_simple_stats() if self.simple_mode else self.get_complex_stats
+        return self.get_simple_stats() if self.simple_mode else self.get_complex_stats()
+
+    def _refresh_stats(self) -> None:
+        """
+        Internal method which snapshots the stats of this monster for its current level.
+        Stats only change when the level or class changes, so this is called on creation and level up.
+        Complexity: O(Comp(stats getters))
+        """
+        MonsterBase.stats_refreshed += 1
+        stats = self._get_stats_mode()
+        if self.simple_mode:
+            self.attack_stat = stats.get_attack()
+            self.defense_stat = stats.get_defense()
+            self.speed_stat = stats.get_speed()
+            self.max_hp_stat = stats.get_max_hp()
+        else:
+            # Complex formulas evaluate to floats, and HP must stay an int (see set_hp), so they are truncated.
+            self.attack_stat = int(stats.get_attack(self.level))
+            self.defense_stat = int(stats.get_defense(self.level))
+            self.speed_stat = int(stats.get_speed(self.level))
+            self.max_hp_stat = int(stats.get_max_hp(self.level))
 
     def get_level(self) -> int:
         """The current level of this monster instance"""
@@ -40,6 +68,7 @@ class MonsterBase(abc.ABC):
         """Increase the level of this monster instance by 1 and force to evolve if possible"""
         prev_max_hp = self.get_max_hp()
         self.level += 1
+        self._refresh_stats()
         increase_hp = self.get_max_hp() - prev_max_hp 
         self.hp += increase_hp
         return self.evolve()
@@ -54,21 +83,32 @@ class MonsterBase(abc.ABC):
             raise ValueError("Invalid HP value")
         self.hp = val
 
+    def restore_state(self, level: int, start_level: int, hp: int) -> None:
+        """
+        Put this monster instance back into a previously recorded state.
+        Stats are only refreshed if the level changed.
+        """
+        if level != self.level:
+            self.level = level
+            self._refresh_stats()
+        self.start_level = start_level
+        self.hp = hp
+
     def get_attack(self) -> int:
         """Get the attack of this monster instance"""
-        return self._get_stats_mode().get_attack()
+        return self.attack_stat
 
     def get_defense(self) -> int:
         """Get the defense of this monster instance"""
-        return self._get_stats_mode().get_defense()
+        return self.defense_stat
 
     def get_speed(self) -> int:
         """Get the speed of this monster instance"""
-        return self._get_stats_mode().get_speed()
+        return self.speed_stat
 
     def get_max_hp(self) -> int:
         """Get the maximum HP of this monster instance"""
-        return self._get_stats_mode().get_max_hp()
+        return self.max_hp_stat
 
     def alive(self) -> bool:
         """Whether the current monster instance is alive (HP > 0 )"""
@@ -134,6 +174,24 @@ class MonsterBase(abc.ABC):
         """
         pass
 
+    @classmethod
+    @abc.abstractmethod
+    def get_element_type(cls) -> Element:
+        """
+        Returns the element of the Monster as an Element.
+        Same for all monsters of the same type.
+        """
+        pass
+
+    @classmethod
+    @abc.abstractmethod
+    def get_element_index(cls) -> int:
+        """
+        Returns the index of the Monster's element, see Element.index.
+        Same for all monsters of the same type.
+        """
+        pass
+
     @classmethod
     @abc.abstractmethod
     def can_be_spawned(cls) -> bool:
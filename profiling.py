@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+from time import perf_counter_ns
+from typing import Callable
+
+from monster_base import MonsterBase
+
+
+class BattleProfiler:
+    """
+    Opt-in call counts and cumulative perf_counter_ns timings for each phase of a battle,
+    plus counts of effectiveness lookups and stat evaluations.
+
+    Profiling replaces the phase methods on a single Battle instance with timed wrappers,
+    so battles that are not profiled run the unmodified class methods at no extra cost.
+    An effectiveness lookup is counted for every multiplier the battle needs, through wrappers on the same instance:
+    one per _compute_damage call, whether the damage table has it memoised or not, and one per _get_effectiveness
+    call from the battle log. So the count only depends on the battles played, not on what a worker's memo holds.
+    Stat evaluations are the MonsterBase._refresh_stats calls made while battle() runs, read from
+    MonsterBase.stats_refreshed, so battles profiled this way must not run concurrently in threads.
+    Profilers only hold ints, so they can be pickled back from worker processes and combined with merge.
+    Timings are inclusive: _both_attack includes the _attack calls it makes, _attack includes _compute_damage.
+
+    Usage:
+        profiler = BattleProfiler()
+        Battle(profiler=profiler).battle(team1, team2)
+        print(profiler.report())
+    """
+
+    BATTLE_PHASES = ("process_turn", "_swap", "_special", "_compute_damage", "_attack", "_both_attack",
+                     "_end_turn", "_check_for_win")
+    TEAM_PHASES = ("choose_action",)
+    PHASES = TEAM_PHASES + BATTLE_PHASES
+
+    def __init__(self) -> None:
+        self.calls = {phase: 0 for phase in self.PHASES}
+        self.time_ns = {phase: 0 for phase in self.PHASES}
+        self.battles = 0
+        self.turns = 0
+        self.effectiveness_lookups = 0
+        self.stat_evaluations = 0
+
+    def _timed(self, phase: str, method: Callable) -> Callable:
+        calls, time_ns = self.calls, self.time_ns
+
+        def timed(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                time_ns[phase] += perf_counter_ns() - start
+                calls[phase] += 1
+        return timed
+
+    def instrument(self, battle) -> None:
+        """
+        Wraps the phase methods of this battle instance, and hooks the battle's damage and effectiveness
+        methods for the lookup count. The choose_action of both teams is only wrapped while battle() runs,
+        so turns played through start and process_turn do not time it.
+        Complexity: O(1)
+        """
+        for phase in self.BATTLE_PHASES:
+            setattr(battle, phase, self._timed(phase, getattr(battle, phase)))
+
+        self._count(battle)
+
+        run = battle.battle
+
+        def profiled_battle(team1, team2):
+            wrapped = []
+            for team in (team1, team2):
+                # Slotted teams such as CompactTeam cannot be wrapped, and are left untimed.
+                if hasattr(team, "__dict__") and "choose_action" not in vars(team):
+                    team.choose_action = self._timed("choose_action", team.choose_action)
+                    wrapped.append(team)
+            stats_refreshed = MonsterBase.stats_refreshed
+            try:
+                result = run(team1, team2)
+            finally:
+                # Teams outlive the battle, so later battles get their own choose_action back.
+                for team in wrapped:
+                    del team.choose_action
+                self.stat_evaluations += MonsterBase.stats_refreshed - stats_refreshed
+            self.battles += 1
+            self.turns += battle.turn_number
+            return result
+
+        battle.battle = profiled_battle
+
+    def _count(self, battle) -> None:
+        """Wraps the battle's damage and effectiveness methods to count the multipliers it needs"""
+        compute_damage = battle._compute_damage
+        get_effectiveness = battle._get_effectiveness
+
+        def counted_compute_damage(attacking_monster, defending_monster):
+            self.effectiveness_lookups += 1
+            return compute_damage(attacking_monster, defending_monster)
+
+        def counted_get_effectiveness(attacking_monster, defending_monster):
+            self.effectiveness_lookups += 1
+            return get_effectiveness(attacking_monster, defending_monster)
+
+        battle._compute_damage = counted_compute_damage
+        battle._get_effectiveness = counted_get_effectiveness
+
+    def merge(self, other: BattleProfiler) -> None:
+        """
+        Adds the counts and timings of another profiler, such as one returned by a worker process.
+        Complexity: O(p), where p is the number of phases
+        """
+        for phase in self.PHASES:
+            self.calls[phase] += other.calls[phase]
+            self.time_ns[phase] += other.time_ns[phase]
+        self.battles += other.battles
+        self.turns += other.turns
+        self.effectiveness_lookups += other.effectiveness_lookups
+        self.stat_evaluations += other.stat_evaluations
+
+    def to_dict(self) -> dict:
+        """JSON friendly summary"""
+        return {
+            "battles": self.battles,
+            "turns": self.turns,
+            "effectiveness_lookups": self.effectiveness_lookups,
+            "stat_evaluations": self.stat_evaluations,
+            "phases": {phase: {"calls": self.calls[phase], "time_ns": self.time_ns[phase]} for phase in self.PHASES},
+        }
+
+    def report(self) -> str:
+        """Table of phases, slowest first"""
+        lines = [f"{self.battles} battles, {self.turns} turns, {self.effectiveness_lookups} effectiveness lookups, "
+                 f"{self.stat_evaluations} stat evaluations",
+                 f"{'phase':<16}{'calls':>10}{'total ms':>12}{'ns/call':>10}"]
+        for phase in sorted(self.PHASES, key=lambda phase: -self.time_ns[phase]):
+            calls, time_ns = self.calls[phase], self.time_ns[phase]
+            lines.append(f"{phase:<16}{calls:>10}{time_ns / 1e6:>12.2f}{time_ns // max(calls, 1):>10}")
+        return "\n".join(lines)
@@ -3,12 +3,124 @@ Random number generator class. Uses LCG method with some reasonable initialisati
 """
 __author__ = "Jackson Goerner"
 
+from array import array
 import time
 
+class RandomStream():
+    """
+    A single, independent stream of (seeded) random numbers.
+
+    Uses LCG method. All methods are O(1) best/worst case time complexity unless stated otherwise.
+    Streams never share state, so every battle or tower can own one and stay reproducible
+    no matter how runs are interleaved across threads or processes.
+
+    Usage:
+    ```
+    rng = RandomStream(123)
+    rng.randint(1, 10)           # Random number from 1 to 10
+    rng.randints(5, 1, 10)       # array of 5 random numbers from 1 to 10
+    worker_rng = rng.substream(3) # Non-overlapping stream for worker 3
+    ```
+    """
+
+    MOD = pow(2, 48)
+    A = 25214903917
+    C = 11
+
+    # Number of draws reserved for each substream before it would overlap the next one.
+    STREAM_SPACING = pow(2, 32)
+
+    def __init__(self, seed=None):
+        self.seed = time.time_ns() if seed is None else seed
+        # Number of steps taken since the initial seed, the stream's offset for replays.
+        self.draws = 0
+
+    def random(self):
+        """Returns a random integer from 0 to 2^32-1"""
+        self.seed = (self.A * self.seed + self.C) % self.MOD
+        self.draws += 1
+        return self.seed >> 16
+
+    def random_float(self):
+        """Returns a random floating point integer in the range 0 to 1."""
+        return self.random() / (1 << 32)
+
+    def randint(self, lo, hi):
+        """Returns a random integer from `lo` to `hi` inclusive on both ends."""
+        return (self.random() % (hi - lo + 1)) + lo
+
+    def randints(self, n, lo, hi) -> array:
+        """
+        Returns an array of `n` random integers from `lo` to `hi` inclusive,
+        the same values as `n` calls to randint.
+        :complexity: O(n)
+        """
+        a, c, mod = self.A, self.C, self.MOD
+        span = hi - lo + 1
+        seed = self.seed
+        values = array("q", bytes(8 * n))
+        for i in range(n):
+            seed = (a * seed + c) % mod
+            values[i] = ((seed >> 16) % span) + lo
+        self.seed = seed
+        self.draws += n
+        return values
+
+    def random_chance(self, ratio):
+        """Returns random()/2^32 < ratio"""
+        return self.random_float() < ratio
+
+    def random_choice(self, collection) -> None:
+        """Returns a random choice from a collection that supports __getitem__ and __len__"""
+        return collection[self.randint(0, len(collection)-1)]
+
+    def random_shuffle(self, collection) -> None:
+        """
+        Randomly shuffles a collection that supports __getitem__, __setitem__ and __len__
+        :complexity: O(len(collection))
+        """
+        positions = [(self.random(), i) for i in range(len(collection))]
+        positions.sort() # I can use inbuilt list sorting here - YOU CANNOT ANYWHERE ELSE! >:D
+        tmp = [collection[p[1]] for p in positions]
+        for x in range(len(collection)):
+            collection[x] = tmp[x]
+
+    def jump(self, steps):
+        """
+        Advance the stream as if `random` had been called `steps` times.
+        :complexity: O(log(steps))
+        """
+        self.draws += steps
+        acc_mult, acc_inc = 1, 0
+        cur_mult, cur_inc = self.A, self.C
+        while steps > 0:
+            if steps & 1:
+                acc_mult = (acc_mult * cur_mult) % self.MOD
+                acc_inc = (acc_inc * cur_mult + cur_inc) % self.MOD
+            cur_inc = ((cur_mult + 1) * cur_inc) % self.MOD
+            cur_mult = (cur_mult * cur_mult) % self.MOD
+            steps >>= 1
+        self.seed = (acc_mult * self.seed + acc_inc) % self.MOD
+
+    def substream(self, index):
+        """
+        Returns a new stream starting `index + 1` spacings ahead of this one.
+        Substreams with different indices do not overlap for their first STREAM_SPACING draws.
+        :complexity: O(log(index * STREAM_SPACING))
+        """
+        child = RandomStream(self.seed)
+        child.jump((index + 1) * self.STREAM_SPACING)
+        return child
+
+
 class RandomGen():
     """
     Class used to generate (seeded) random numbers for interesting outcomes and repeatable tests.
 
+    This is a facade over a single default RandomStream shared by the whole process.
+    Code that needs its own reproducible stream should create a RandomStream instead;
+    both expose the same methods, so either can be passed where a generator is expected.
+
     Uses LCG method. All methods are O(1) best/worst case time complexity unless stated otherwise.
 
     Usage:
@@ -20,43 +132,49 @@ class RandomGen():
     ```
     """
 
-    MOD = pow(2, 48)
-    A = 25214903917
-    C = 11
+    MOD = RandomStream.MOD
+    A = RandomStream.A
+    C = RandomStream.C
 
-    seed = time.time_ns()
+    stream = RandomStream()
 
     @classmethod
     def set_seed(cls, seed=None):
         """Seed all future calls to `random`."""
-        seed = time.time_ns() if seed is None else seed
-        cls.seed = seed
+        cls.stream = RandomStream(seed)
 
     @classmethod
     def random(cls):
         """Returns a random integer from 0 to 2^32-1"""
-        cls.seed = (cls.A * cls.seed + cls.C) % cls.MOD
-        return cls.seed >> 16
+        return cls.stream.random()
 
     @classmethod
     def random_float(cls):
         """Returns a random floating point integer in the range 0 to 1."""
-        return cls.random() / (1 << 32)
+        return cls.stream.random_float()
 
     @classmethod
     def randint(cls, lo, hi):
         """Returns a random integer from `lo` to `hi` inclusive on both ends."""
-        return (cls.random() % (hi - lo + 1)) + lo
+        return cls.stream.randint(lo, hi)
+
+    @classmethod
+    def randints(cls, n, lo, hi) -> array:
+        """
+        Returns an array of `n` random integers from `lo` to `hi` inclusive.
+        :complexity: O(n)
+        """
+        return cls.stream.randints(n, lo, hi)
 
     @classmethod
     def random_chance(cls, ratio):
         """Returns random()/2^32 < ratio"""
-        return cls.random_float() < ratio
+        return cls.stream.random_chance(ratio)
 
     @classmethod
     def random_choice(cls, collection) -> None:
         """Returns a random choice from a collection that supports __getitem__ and __len__"""
-        return collection[cls.randint(0, len(collection)-1)]
+        return cls.stream.random_choice(collection)
 
     @classmethod
     def random_shuffle(cls, collection) -> None:
@@ -64,8 +182,12 @@ class RandomGen():
         Randomly shuffles a collection that supports __getitem__, __setitem__ and __len__
         :complexity: O(len(collection))
         """
-        positions = [(RandomGen.random(), i) for i in range(len(collection))]
-        positions.sort() # I can use inbuilt list sorting here - YOU CANNOT ANYWHERE ELSE! >:D
-        tmp = [collection[p[1]] for p in positions]
-        for x in range(len(collection)):
-            collection[x] = tmp[x]
+        cls.stream.random_shuffle(collection)
+
+    @classmethod
+    def substream(cls, index):
+        """
+        Returns a new, independent stream derived from the default stream.
+        :complexity: O(log(index * STREAM_SPACING))
+        """
+        return cls.stream.substream(index)
@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from random_gen import RandomStream
+from helpers import get_all_monsters
+from monster_base import MonsterBase
+from team import MonsterTeam, TeamSnapshot
+from battle import Battle
+from simulation import Matchup
+
+# (name, simple mode, level, start level, HP) of one monster.
+MonsterState = tuple[str, bool, int, int, int]
+
+
+def _monster_state(monster: MonsterBase) -> MonsterState:
+    return (monster.get_name(), monster.simple_mode, monster.level, monster.start_level, monster.hp)
+
+
+def _build_monster(state: MonsterState, monsters_by_name: dict[str, type[MonsterBase]]) -> MonsterBase:
+    name, simple_mode, level, start_level, hp = state
+    monster = monsters_by_name[name](simple_mode=simple_mode, level=level)
+    monster.restore_state(level, start_level, hp)
+    return monster
+
+
+class TeamState:
+    """
+    The monsters left in a team and their state, in retrieval order, copied out of the team
+    so later turns cannot change it.
+
+    Attributes:
+        team_mode (MonsterTeam.TeamMode), sort_key (MonsterTeam.SortMode | None), team_limit (int): How the team is built
+        monsters (tuple[MonsterState, ...]): Every monster waiting in the team
+        keys (tuple | None): OPTIMISE sort key of each monster
+        descending (bool): OPTIMISE retrieval order
+        added_count (int): OPTIMISE insertion counter, so monsters added later break ties the same way
+    """
+
+    __slots__ = ("team_mode", "sort_key", "team_limit", "monsters", "keys", "descending", "added_count")
+
+    def __init__(self, team_mode: MonsterTeam.TeamMode, sort_key: Optional[MonsterTeam.SortMode], team_limit: int,
+                 monsters: tuple[MonsterState, ...], keys: Optional[tuple] = None, descending: bool = True,
+                 added_count: int = 0) -> None:
+        self.team_mode = team_mode
+        self.sort_key = sort_key
+        self.team_limit = team_limit
+        self.monsters = monsters
+        self.keys = keys
+        self.descending = descending
+        self.added_count = added_count
+
+    @classmethod
+    def of(cls, team: MonsterTeam) -> TeamState:
+        """
+        The current state of a team, leaving the team unchanged.
+        Complexity: O(n), where n is the number of monsters in the team
+        """
+        if not isinstance(team, MonsterTeam):
+            raise ValueError("Only battles between MonsterTeams can be recorded")
+        snapshot = team.snapshot()
+        return cls(team.team_mode, getattr(team, "sort_key", None), team.team_maxsize,
+                   tuple(_monster_state(monster) for monster in snapshot.monsters),
+                   snapshot.keys, snapshot.descending, getattr(team, "added_count", 0))
+
+    def build(self, monsters_by_name: dict[str, type[MonsterBase]]) -> MonsterTeam:
+        """
+        A new team in this state, with new monster instances.
+        Complexity: O(n), where n is the number of monsters in the team
+        """
+        kwargs = {"team_limit": self.team_limit}
+        if self.sort_key is not None:
+            kwargs["sort_key"] = self.sort_key
+        team = MonsterTeam(self.team_mode, MonsterTeam.SelectionMode.PROVIDED, provided_monsters=(), **kwargs)
+        monsters = tuple(_build_monster(state, monsters_by_name) for state in self.monsters)
+        team.restore(TeamSnapshot(monsters, self.keys, self.descending))
+        if self.team_mode == MonsterTeam.TeamMode.OPTIMISE:
+            team.added_count = self.added_count
+        return team
+
+    def to_dict(self) -> dict:
+        return {
+            "team_mode": self.team_mode.name,
+            "sort_key": None if self.sort_key is None else self.sort_key.name,
+            "team_limit": self.team_limit,
+            "monsters": [list(monster) for monster in self.monsters],
+            "keys": None if self.keys is None else [list(key) for key in self.keys],
+            "descending": self.descending,
+            "added_count": self.added_count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> TeamState:
+        return cls(
+            MonsterTeam.TeamMode[data["team_mode"]],
+            None if data["sort_key"] is None else MonsterTeam.SortMode[data["sort_key"]],
+            data["team_limit"],
+            tuple(tuple(monster) for monster in data["monsters"]),
+            None if data["keys"] is None else tuple(tuple(key) for key in data["keys"]),
+            data["descending"],
+            data["added_count"],
+        )
+
+
+class BattleState:
+    """
+    Everything needed to carry a battle on from the end of one turn: both teams, the monsters out
+    and whether each team has run out.
+    """
+
+    __slots__ = ("turn_number", "team1", "team2", "out1", "out2", "team1_dead", "team2_dead")
+
+    def __init__(self, turn_number: int, team1: TeamState, team2: TeamState, out1: MonsterState, out2: MonsterState,
+                 team1_dead: bool, team2_dead: bool) -> None:
+        self.turn_number = turn_number
+        self.team1 = team1
+        self.team2 = team2
+        self.out1 = out1
+        self.out2 = out2
+        self.team1_dead = team1_dead
+        self.team2_dead = team2_dead
+
+    @classmethod
+    def of(cls, battle: Battle) -> BattleState:
+        """
+        The current state of a started battle.
+        Complexity: O(n), where n is the number of monsters in both teams
+        """
+        return cls(battle.turn_number, TeamState.of(battle.team1), TeamState.of(battle.team2),
+                   _monster_state(battle.out1), _monster_state(battle.out2), battle.team1_dead, battle.team2_dead)
+
+    def restore(self, battle: Battle, monsters_by_name: dict[str, type[MonsterBase]]) -> None:
+        """
+        Puts a battle into this state, with new teams and monsters, as if it had played up to this turn.
+        Complexity: O(n), where n is the number of monsters in both teams
+        """
+        battle.turn_number = self.turn_number
+        battle.team1 = self.team1.build(monsters_by_name)
+        battle.team2 = self.team2.build(monsters_by_name)
+        battle.out1 = _build_monster(self.out1, monsters_by_name)
+        battle.out2 = _build_monster(self.out2, monsters_by_name)
+        battle.team1_dead = self.team1_dead
+        battle.team2_dead = self.team2_dead
+
+    def result(self) -> Optional[Battle.Result]:
+        """How the battle ended, or None if it had not ended by this turn"""
+        if self.team1_dead and self.team2_dead:
+            return Battle.Result.DRAW
+        if self.team1_dead:
+            return Battle.Result.TEAM2
+        if self.team2_dead:
+            return Battle.Result.TEAM1
+        return None
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, BattleState):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def to_dict(self) -> dict:
+        return {
+            "turn_number": self.turn_number,
+            "team1": self.team1.to_dict(),
+            "team2": self.team2.to_dict(),
+            "out1": list(self.out1),
+            "out2": list(self.out2),
+            "team1_dead": self.team1_dead,
+            "team2_dead": self.team2_dead,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> BattleState:
+        return cls(
+            data["turn_number"],
+            TeamState.from_dict(data["team1"]),
+            TeamState.from_dict(data["team2"]),
+            tuple(data["out1"]),
+            tuple(data["out2"]),
+            data["team1_dead"],
+            data["team2_dead"],
+        )
+
+
+class ReplayRecord:
+    """
+    The state of one battle before its first turn and at the end of every turn.
+
+    Attributes:
+        states (list[BattleState]): states[t] is the battle at the end of turn t, states[0] once it has started
+    """
+
+    def __init__(self, states: list[BattleState]) -> None:
+        self.states = states
+
+    @property
+    def turns(self) -> int:
+        return len(self.states) - 1
+
+    @property
+    def result(self) -> Optional[Battle.Result]:
+        """How the battle ended, None if the recording stopped before the end"""
+        return self.states[-1].result()
+
+    def to_dict(self) -> dict:
+        """JSON friendly form of the record"""
+        return {"states": [state.to_dict() for state in self.states]}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> ReplayRecord:
+        return cls([BattleState.from_dict(state) for state in data["states"]])
+
+
+class BattleRecorder:
+    """
+    Records every battle fought by the Battle it is given to, one ReplayRecord per battle.
+    It works for any Battle, including the one a BattleTower fights with.
+
+    Recording copies both teams every turn, O(n) per turn for n monsters, so only record battles to be replayed.
+
+    Usage:
+        recorder = BattleRecorder()
+        tower = BattleTower(battle=Battle(recorder=recorder))
+        ...
+        BattleReplay(recorder.records[3]).fast_forward(12)
+    """
+
+    def __init__(self) -> None:
+        self.records: list[ReplayRecord] = []
+
+    def __call__(self, battle: Battle) -> None:
+        """Called by Battle.battle once the battle has started and at the end of every turn"""
+        state = BattleState.of(battle)
+        if battle.turn_number == 0:
+            self.records.append(ReplayRecord([state]))
+        else:
+            self.records[-1].states.append(state)
+
+
+class BattleReplay:
+    """
+    Puts a recorded battle into the state of any turn, and plays it on from there.
+
+    fast_forward jumps straight to a recorded turn by restoring its state, without playing the turns before it.
+    step plays the next turn for real and checks the battle against the record, raising ValueError
+    at the first turn that diverged, so replaying from turn 0 verifies the whole record.
+
+    Usage:
+        record = record_matchup(matchup)
+        replay = BattleReplay(record)
+        battle = replay.fast_forward(12)   # state at the end of turn 12
+        battle.out1, battle.team1, ...
+        replay.step()                      # plays turn 13
+    """
+
+    def __init__(self, record: ReplayRecord) -> None:
+        """
+        Sets up the battle before its first turn.
+        Complexity: O(n), where n is the number of monsters in both teams
+        """
+        self.record = record
+        self.monsters_by_name = {monster.get_name(): monster for monster in get_all_monsters()}
+        self.battle = Battle(verbosity=0)
+        self.fast_forward(0)
+
+    def step(self) -> Optional[Battle.Result]:
+        """
+        Plays the next turn, returning the result if the battle ended on it.
+        Complexity: O(Comp(Battle.process_turn) + n), where n is the number of monsters in both teams
+        """
+        if self.result is not None:
+            raise ValueError("The battle has already ended")
+        battle = self.battle
+        turn = battle.turn_number + 1
+        if turn > self.record.turns:
+            raise ValueError("The record ends before this turn")
+        battle.turn_number = turn
+        self.result = battle.process_turn()
+        if BattleState.of(battle) != self.record.states[turn]:
+            raise ValueError(f"Replay diverged from the record on turn {turn}")
+        return self.result
+
+    def fast_forward(self, turn: int) -> Battle:
+        """
+        Puts the battle into its state at the end of the given turn (0 for before the first turn) and returns it.
+        Turns can be visited in any order.
+        Complexity: O(n), where n is the number of monsters in both teams
+        """
+        if not 0 <= turn <= self.record.turns:
+            raise ValueError(f"Turn must be between 0 and {self.record.turns}")
+        state = self.record.states[turn]
+        state.restore(self.battle, self.monsters_by_name)
+        self.result = state.result()
+        return self.battle
+
+    def verify(self) -> Optional[Battle.Result]:
+        """
+        Plays the whole battle from the start, checking every turn against the record.
+        Complexity: O(k * Comp(step)), where k is the number of turns
+        """
+        self.fast_forward(0)
+        while self.battle.turn_number < self.record.turns:
+            self.step()
+        return self.result
+
+
+def record_matchup(matchup: Matchup) -> ReplayRecord:
+    """
+    Runs a matchup from its seed like simulation.run_matchup, recording it for replay.
+    Complexity: O(Comp(Battle.battle) + k * n), with k turns and n monsters in both teams
+    """
+    monsters_by_name = {monster.get_name(): monster for monster in get_all_monsters()}
+    rng = RandomStream(matchup.seed)
+    team1 = matchup.team1.build(monsters_by_name, rng)
+    team2 = matchup.team2.build(monsters_by_name, rng)
+    recorder = BattleRecorder()
+    Battle(verbosity=0, recorder=recorder).battle(team1, team2)
+    return recorder.records[0]
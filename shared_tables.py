@@ -0,0 +1,158 @@
+"""
+Shares the read-only game data with worker processes through multiprocessing.shared_memory.
+
+The parent publishes the effectiveness matrix, the parsed monster catalog and the monster stat table
+once, and names the segments in environment variables that worker processes inherit. When a worker
+imports elements.py and helpers.py they attach to those segments instead of reading
+type_effectiveness.csv and monsters.yaml again, so every worker shares one copy of the tables.
+
+This module only imports the standard library at the top, so elements.py and helpers.py can use it
+while they are being imported.
+"""
+from __future__ import annotations
+
+import os
+from array import array
+from multiprocessing import shared_memory
+from typing import Optional
+
+EFFECTIVENESS_ENV = "MONSTER_EFFECTIVENESS_SHM"
+CATALOG_ENV = "MONSTER_CATALOG_SHM"
+STATS_ENV = "MONSTER_STATS_SHM"
+
+# Rows of the stat table, each with one int per monster in get_all_monsters() order.
+STAT_FIELDS = ("attack", "defense", "speed", "max_hp", "element", "evolution")
+
+
+class _Attachment(shared_memory.SharedMemory):
+    """
+    A segment mapped until detach closes it. Tables built on it may still be in use when it is garbage
+    collected, so it is not closed then, and a mapping detach could not close goes when the process does.
+    """
+
+    def __del__(self) -> None:
+        pass
+
+
+# Segments attached by this process, by name.
+_attached: dict[str, _Attachment] = {}
+
+
+def stat_table() -> array:
+    """
+    The simple stats, element index and evolution (-1 for none) of every monster,
+    one row of STAT_FIELDS at a time.
+    Complexity: O(n), where n is the number of monster classes
+    """
+    from helpers import get_all_monsters
+    monsters = get_all_monsters()
+    class_ids = {monster.get_name(): i for i, monster in enumerate(monsters)}
+    n = len(monsters)
+    table = array("q", bytes(8 * len(STAT_FIELDS) * n))
+    for i, monster in enumerate(monsters):
+        stats = monster.get_simple_stats()
+        evolution = monster.get_evolution()
+        row_values = (
+            stats.get_attack(),
+            stats.get_defense(),
+            stats.get_speed(),
+            stats.get_max_hp(),
+            monster.get_element_index(),
+            -1 if evolution is None else class_ids[evolution.get_name()],
+        )
+        for row, value in enumerate(row_values):
+            table[row * n + i] = value
+    return table
+
+
+def attach(env_var: str) -> Optional[memoryview]:
+    """
+    The bytes of the segment named in this environment variable, or None if nothing was published.
+    Complexity: O(1), the segment is mapped rather than copied
+    """
+    published = os.environ.get(env_var)
+    if not published:
+        return None
+    name, size = published.rsplit(":", 1)
+    if name not in _attached:
+        try:
+            # Workers must not unlink the parent's segments when they exit.
+            _attached[name] = _Attachment(name=name, track=False)
+        except TypeError:
+            _attached[name] = _Attachment(name=name)
+    return _attached[name].buf[:int(size)]
+
+
+def detach() -> None:
+    """
+    Closes every segment this process attached to, such as when a worker shuts down.
+    A segment that a table still in use is built on cannot be closed, and stays mapped until the process exits.
+    Complexity: O(s), where s is the number of attached segments
+    """
+    for segment in _attached.values():
+        try:
+            segment.close()
+        except BufferError:
+            pass
+    # A failed close has already let go of segment.buf, so a later attach maps the segment again.
+    _attached.clear()
+
+
+class SharedTables:
+    """
+    Publishes the game data for worker processes, and removes it again on close.
+
+    Usage:
+        with SharedTables():
+            with ProcessPoolExecutor() as executor:
+                ...
+    """
+
+    def __init__(self) -> None:
+        """
+        Copies each table into its own segment.
+        Complexity: O(n + E^2), where n is the number of monster classes and E the number of elements
+        """
+        import pickle
+        from elements import EffectivenessCalculator
+        from helpers import _load_monster_data
+
+        self.segments: list[shared_memory.SharedMemory] = []
+        self.environment: dict[str, str] = {}
+        self.previous_environment: dict[str, Optional[str]] = {}
+        try:
+            self._publish(EFFECTIVENESS_ENV, memoryview(EffectivenessCalculator.instance.effectiveness_table).cast("B"))
+            self._publish(CATALOG_ENV, pickle.dumps(_load_monster_data(), protocol=pickle.HIGHEST_PROTOCOL))
+            self._publish(STATS_ENV, memoryview(stat_table()).cast("B"))
+        except BaseException:
+            self.close()
+            raise
+
+    def _publish(self, env_var: str, data: bytes | memoryview) -> None:
+        segment = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+        self.segments.append(segment)
+        segment.buf[:len(data)] = data
+        self.environment[env_var] = f"{segment.name}:{len(data)}"
+
+    def __enter__(self) -> SharedTables:
+        """Names the segments in os.environ, so worker processes started inside the block attach to them"""
+        for env_var, value in self.environment.items():
+            self.previous_environment[env_var] = os.environ.get(env_var)
+            os.environ[env_var] = value
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for env_var, value in self.previous_environment.items():
+            if value is None:
+                os.environ.pop(env_var, None)
+            else:
+                os.environ[env_var] = value
+        self.previous_environment.clear()
+        self.close()
+
+    def close(self) -> None:
+        """Frees the segments. Workers must have finished with them."""
+        for segment in self.segments:
+            segment.close()
+            segment.unlink()
+        self.segments.clear()
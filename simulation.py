@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from multiprocessing.util import Finalize
+from typing import Iterable, Iterator, Optional
+
+from random_gen import RandomStream
+from helpers import get_all_monsters
+from elements import EffectivenessCalculator
+from team import MonsterTeam
+from battle import Battle
+from profiling import BattleProfiler
+from damage_table import DamageTable, source_fingerprint
+from shared_tables import SharedTables, detach
+
+
+class TeamSpec:
+    """
+    Picklable description of a team, used to rebuild the same team inside a worker process.
+
+    If monster_names is None the team is selected randomly from the matchup's seed.
+    team_limit defaults to MonsterTeam.TEAM_LIMIT, or the number of names if that is larger.
+    """
+
+    def __init__(
+        self,
+        monster_names: Optional[tuple[str, ...]] = None,
+        team_mode: MonsterTeam.TeamMode = MonsterTeam.TeamMode.BACK,
+        sort_key: Optional[MonsterTeam.SortMode] = None,
+        team_limit: Optional[int] = None,
+    ) -> None:
+        self.monster_names = None if monster_names is None else tuple(monster_names)
+        self.team_mode = team_mode
+        self.sort_key = sort_key
+        if team_limit is None:
+            team_limit = max(MonsterTeam.TEAM_LIMIT, len(self.monster_names or ()))
+        self.team_limit = team_limit
+
+    def build(self, monsters_by_name: dict[str, type], rng: RandomStream) -> MonsterTeam:
+        """
+        Creates a fresh team from this spec, drawing any random choices from rng.
+        Complexity: O(Comp(MonsterTeam()))
+        """
+        kwargs = {"rng": rng, "team_limit": self.team_limit}
+        if self.team_mode == MonsterTeam.TeamMode.OPTIMISE:
+            kwargs["sort_key"] = self.sort_key or MonsterTeam.SortMode.HP
+        if self.monster_names is None:
+            return MonsterTeam(self.team_mode, MonsterTeam.SelectionMode.RANDOM, **kwargs)
+        provided = [monsters_by_name[name] for name in self.monster_names]
+        return MonsterTeam(self.team_mode, MonsterTeam.SelectionMode.PROVIDED, provided_monsters=provided, **kwargs)
+
+
+class Matchup:
+    """A single battle to simulate: two team specs and the seed the battle runs from."""
+
+    def __init__(self, team1: TeamSpec, team2: TeamSpec, seed: int) -> None:
+        self.team1 = team1
+        self.team2 = team2
+        self.seed = seed
+
+
+class BatchResult:
+    """
+    Aggregated outcome of a batch of battles.
+
+    Attributes:
+        team1_wins (int): Battles won by team 1
+        team2_wins (int): Battles won by team 2
+        draws (int): Drawn battles
+        turn_histogram (dict[int, int]): Number of battles that lasted each number of turns
+        profiler (BattleProfiler | None): Phase timings of every battle, if the batch was profiled
+    """
+
+    def __init__(self) -> None:
+        self.team1_wins = 0
+        self.team2_wins = 0
+        self.draws = 0
+        self.turn_histogram: dict[int, int] = {}
+        self.profiler: Optional[BattleProfiler] = None
+
+    def __len__(self) -> int:
+        """Number of battles recorded"""
+        return self.team1_wins + self.team2_wins + self.draws
+
+    def record(self, result: Battle.Result, turns: int) -> None:
+        """
+        Adds a single battle to the totals.
+        Complexity: O(1)
+        """
+        if result == Battle.Result.TEAM1:
+            self.team1_wins += 1
+        elif result == Battle.Result.TEAM2:
+            self.team2_wins += 1
+        else:
+            self.draws += 1
+        self.turn_histogram[turns] = self.turn_histogram.get(turns, 0) + 1
+
+    def merge(self, other: BatchResult) -> None:
+        """
+        Adds the totals of another batch to this one.
+        Complexity: O(t), where t is the number of distinct turn counts in other
+        """
+        self.team1_wins += other.team1_wins
+        self.team2_wins += other.team2_wins
+        self.draws += other.draws
+        for turns, count in other.turn_histogram.items():
+            self.turn_histogram[turns] = self.turn_histogram.get(turns, 0) + count
+        if other.profiler is not None:
+            if self.profiler is None:
+                self.profiler = BattleProfiler()
+            self.profiler.merge(other.profiler)
+
+
+# Monster classes by name and the damage memo, built once per worker process.
+_monsters_by_name: Optional[dict[str, type]] = None
+_damage_table: Optional[DamageTable] = None
+
+
+def _init_worker(damage_table: bool = True, fingerprint: Optional[str] = None) -> None:
+    """
+    Builds the monster classes, and loads any saved damage table if battles use one, once per process.
+    fingerprint is the source_fingerprint of the data files if the caller already has it.
+    """
+    global _monsters_by_name, _damage_table
+    if _monsters_by_name is None:
+        _monsters_by_name = {monster.get_name(): monster for monster in get_all_monsters()}
+    if damage_table and _damage_table is None:
+        _damage_table = DamageTable.load(fingerprint=fingerprint)
+
+
+def _start_worker(damage_table: bool, fingerprint: Optional[str]) -> None:
+    """Sets up a pool worker as it starts, and has it close its shared memory when the pool shuts it down"""
+    _init_worker(damage_table, fingerprint)
+    Finalize(None, _close_worker, exitpriority=0)
+
+
+def _close_worker() -> None:
+    """
+    Closes the segments a worker attached to. Its effectiveness table is a view of one of them,
+    so that is dropped first; nothing else runs in the worker after this.
+    """
+    EffectivenessCalculator.instance = None
+    detach()
+
+
+@contextmanager
+def worker_pool(max_workers: Optional[int] = None, damage_table: bool = True) -> Iterator[ProcessPoolExecutor]:
+    """
+    A process pool for running matchups, whose workers attach to the game data published in shared memory
+    and set up their monster classes once as they start, and their damage table too if damage_table is set.
+    The data files are hashed once here for the damage table, rather than by every worker.
+    Workers close their segments as the pool shuts them down, and the shared data is removed when the block exits.
+    """
+    fingerprint = source_fingerprint() if damage_table else None
+    with SharedTables(), ProcessPoolExecutor(max_workers=max_workers, initializer=_start_worker,
+                                             initargs=(damage_table, fingerprint)) as executor:
+        yield executor
+
+
+def run_matchup(matchup: Matchup, profiler: Optional[BattleProfiler] = None,
+                damage_table: bool = True) -> tuple[Battle.Result, int]:
+    """
+    Runs a single matchup from its seed, returning the result and the number of turns taken.
+    With damage_table set, damage is looked up in this process's DamageTable, loaded the first time it is needed,
+    otherwise every hit is computed.
+    Complexity: O(Comp(Battle.battle))
+    """
+    if _monsters_by_name is None or (damage_table and _damage_table is None):
+        _init_worker(damage_table)
+    rng = RandomStream(matchup.seed)
+    team1 = matchup.team1.build(_monsters_by_name, rng)
+    team2 = matchup.team2.build(_monsters_by_name, rng)
+    battle = Battle(verbosity=0, profiler=profiler, damage_table=_damage_table if damage_table else None)
+    result = battle.battle(team1, team2)
+    return result, battle.turn_number
+
+
+def _run_chunk(matchups: list[Matchup], profile: bool = False, damage_table: bool = True) -> BatchResult:
+    """Runs a chunk of matchups inside a worker and aggregates them before sending them back"""
+    totals = BatchResult()
+    if profile:
+        totals.profiler = BattleProfiler()
+    for matchup in matchups:
+        totals.record(*run_matchup(matchup, totals.profiler, damage_table))
+    return totals
+
+
+def simulate_batch(matchups: Iterable[Matchup], max_workers: Optional[int] = None, chunk_size: int = 64,
+                   profile: bool = False, damage_table: bool = True) -> BatchResult:
+    """
+    Runs every matchup across a pool of worker processes and aggregates the results.
+
+    Each matchup gets its own RandomStream from its seed, so the totals do not depend on how the work is split.
+    Setting max_workers to 1 runs the batch in the current process.
+    Workers attach to the game data the parent publishes in shared memory rather than loading it themselves.
+    With profile set, the result's profiler holds the phase timings of every battle, merged across workers.
+    damage_table is on by default, so damage is memoised in a DamageTable per worker, loaded from
+    damage_table.DAMAGE_TABLE_FILE if one was saved. Turn it off to compute every hit, for instance
+    to time the two paths against each other.
+
+    Complexity: O(n * Comp(Battle.battle) / w), where n is the number of matchups and w the number of workers
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    matchups = list(matchups)
+    chunks = [matchups[i:i + chunk_size] for i in range(0, len(matchups), chunk_size)]
+    totals = BatchResult()
+    if max_workers == 1:
+        for chunk in chunks:
+            totals.merge(_run_chunk(chunk, profile, damage_table))
+        return totals
+
+    with worker_pool(max_workers, damage_table) as executor:
+        for chunk_totals in executor.map(partial(_run_chunk, profile=profile, damage_table=damage_table), chunks):
+            totals.merge(chunk_totals)
+    return totals
+
+
+if __name__ == "__main__":
+    random_team = TeamSpec()
+    batch = [Matchup(random_team, random_team, seed) for seed in range(1000)]
+    totals = simulate_batch(batch)
+    print(f"Team 1: {totals.team1_wins}, Team 2: {totals.team2_wins}, Draws: {totals.draws}")
+    print(f"Turns: {dict(sorted(totals.turn_histogram.items()))}")
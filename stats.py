@@ -1,4 +1,6 @@
 import abc
+import functools
+from typing import Callable
 
 from data_structures.referential_array import ArrayR
 from data_structures.stack_adt import *
@@ -60,6 +62,116 @@ class SimpleStats(Stats):
         """returns the maximum hit points of the monster"""
         return self.max_hp
 
+FORMULA_CACHE_SIZE = 64
+
+Evaluator = Callable[[int], float]
+
+
+def _binary(operator: str, a: Evaluator, b: Evaluator) -> Evaluator:
+    """Builds the evaluator for `a operator b`, where b was on top of the stack"""
+    if operator == "+":
+        return lambda level: b(level) + a(level)
+    if operator == "-":
+        return lambda level: a(level) - b(level)
+    if operator == "*":
+        return lambda level: a(level) * b(level)
+    if operator == "/":
+        return lambda level: a(level) / b(level)
+    return lambda level: a(level) ** b(level)
+
+
+def _middle(a: Evaluator, b: Evaluator, c: Evaluator) -> Evaluator:
+    """Builds the evaluator for the median of three values"""
+    def evaluate(level: int) -> float:
+        x, y, z = a(level), b(level), c(level)
+        return max(min(x, y), min(max(x, y), z))
+    return evaluate
+
+
+class CompiledFormula:
+    """
+    A reverse polish ComplexStats formula, compiled once into a single closure of the level.
+
+    The token list is parsed and validated when the formula is compiled, so evaluation never
+    touches the tokens again. Results are memoised per level in a bounded LRU cache.
+
+    Usage:
+        CompiledFormula(ArrayR.from_list(["level", "2", "*"]))(3) # 6.0
+    """
+
+    BINARY_OPERATORS = ("+", "-", "*", "/", "power")
+
+    def __init__(self, formula: ArrayR[str]) -> None:
+        """
+        Compile a formula.
+        Complexity: O(n), where n is the number of tokens in the formula
+        """
+        self.formula = formula
+        self._evaluate = functools.lru_cache(maxsize=FORMULA_CACHE_SIZE)(self._compile(formula))
+
+    def __call__(self, level: int) -> float:
+        """
+        Evaluate the formula at the given level.
+        Complexity: O(1) when cached, otherwise O(n) where n is the number of tokens
+        """
+        return self._evaluate(level)
+
+    @classmethod
+    def _compile(cls, formula: ArrayR[str]) -> Evaluator:
+        """
+        Turns the token list into one evaluator, raising ValueError if the formula is malformed.
+        Complexity: O(n), where n is the number of tokens in the formula
+        """
+        stack = ArrayStack(len(formula))
+        for element in formula:
+            if element == "level":
+                stack.push(lambda level: float(level))
+            elif element in cls.BINARY_OPERATORS:
+                cls._require(stack, 2, formula)
+                b, a = stack.pop(), stack.pop()
+                stack.push(_binary(element, a, b))
+            elif element == "middle":
+                cls._require(stack, 3, formula)
+                stack.push(_middle(stack.pop(), stack.pop(), stack.pop()))
+            elif element == "sqrt":
+                cls._require(stack, 1, formula)
+                operand = stack.pop()
+                stack.push(lambda level, operand=operand: operand(level) ** 0.5)
+            else:
+                try:
+                    number = float(element)
+                except ValueError:
+                    raise ValueError(f"Unexpected token {element} in formula")
+                stack.push(lambda level, number=number: number)
+
+        if len(stack) != 1:
+            raise ValueError(f"Formula {formula} does not reduce to a single value")
+        return stack.pop()
+
+    @staticmethod
+    def _require(stack: ArrayStack, count: int, formula: ArrayR[str]) -> None:
+        """Raises ValueError if the stack holds fewer than count operands"""
+        if len(stack) < count:
+            raise ValueError(f"Not enough operands in formula {formula}")
+
+
+_compiled_formulas: dict[tuple[str, ...], CompiledFormula] = {}
+
+
+def compile_formula(formula: ArrayR[str]) -> CompiledFormula:
+    """
+    Returns the compiled version of a formula, sharing one compiled formula (and cache)
+    between every identical token list.
+    Complexity: O(n), where n is the number of tokens in the formula
+    """
+    tokens = tuple(formula)
+    compiled = _compiled_formulas.get(tokens)
+    if compiled is None:
+        compiled = CompiledFormula(formula)
+        _compiled_formulas[tokens] = compiled
+    return compiled
+
+
 class ComplexStats(Stats):
 
     def __init__(
@@ -73,64 +185,23 @@ class ComplexStats(Stats):
         self.defense_formula =defense_formula
         self.speed_formula = speed_formula
         self.max_hp_formula = max_hp_formula
+        self.attack_evaluator = compile_formula(attack_formula)
+        self.defense_evaluator = compile_formula(defense_formula)
+        self.speed_evaluator = compile_formula(speed_formula)
+        self.max_hp_evaluator = compile_formula(max_hp_formula)
         
 
     def get_attack(self, level: int) -> int:
-        return self._calculate(self.attack_formula, level)
+        return self.attack_evaluator(level)
 
     def get_defense(self, level: int) -> int:
-        return self._calculate(self.defense_formula, level)
+        return self.defense_evaluator(level)
 
     def get_speed(self, level: int) -> int:
-        return self._calculate(self.speed_formula, level)
+        return self.speed_evaluator(level)
 
     def get_max_hp(self, level: int) -> int:
-        return self._calculate(self.max_hp_formula, level)
+        return self.max_hp_evaluator(level)
     
     def _calculate(self, formula: ArrayR[str], level: int) -> int:
-        stack = ArrayStack(len(formula))
-        sorted_list = ArraySortedList(3)
-        for element in formula:
-            try: 
-                number = float(element)
-                stack.push(number)
-            except ValueError:
-                pass
-            
-            if element == "level":
-                stack.push(float(level))
-
-            elif element == "+":
-                b, a = stack.pop(), stack.pop()
-                stack.push(b + a)
-
-
-            elif element == "-":
-                b, a = stack.pop(), stack.pop()
-                stack.push(a - b)
-
-            elif element == "*":
-                b, a = stack.pop(), stack.pop()
-                stack.push(a * b)
-
-            elif element == "/":
-                b, a = stack.pop(), stack.pop()
-                stack.push(a / b)
-
-            elif element == "middle":
-                for i in range(3):
-                    number = stack.pop()
-                    list_item = ListItem(number, number)
-                    sorted_list.add(list_item)
-                stack.push(sorted_list[1].value)
-
-
-            elif element == "power":
-                b, a = stack.pop(), stack.pop()
-                stack.push(a ** b)
-                
-
-            elif element == "sqrt":
-                stack.push(stack.pop() ** 0.5)
-
-        return stack.pop()
+        return compile_formula(formula)(level)
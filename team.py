@@ -1,21 +1,66 @@
 from __future__ import annotations
+from array import array
 from enum import auto
 from typing import Optional, TYPE_CHECKING
 
 from base_enum import BaseEnum
 from monster_base import MonsterBase
+from elements import Element
 from random_gen import RandomGen
-from helpers import get_all_monsters
+from helpers import get_all_monsters, get_monster_registry
+from min_max_heap import MinMaxHeap
+from growable_containers import GrowableStack, GrowableQueue
 
 from data_structures.referential_array import ArrayR
 from data_structures.queue_adt import CircularQueue
 from data_structures.stack_adt import ArrayStack
 from data_structures.sorted_list_adt import *
-from data_structures.array_sorted_list import ArraySortedList 
 
 if TYPE_CHECKING:
     from battle import Battle
 
+class TeamSnapshot:
+    """
+    Compact record of a team's monsters, used to put the team back the way it was.
+
+    The snapshot keeps references to the monster instances rather than copies, plus their
+    level, start level, HP (and sort key in OPTIMISE mode) in flat arrays, in retrieval order,
+    and how many of its monsters have each element, indexed by Element.index.
+    It is never modified, so one snapshot can be restored any number of times.
+    Restoring resets every monster's start level and HP, and only re-evaluates the stats of monsters whose level changed.
+    """
+
+    __slots__ = ("monsters", "levels", "start_levels", "hps", "keys", "descending", "element_counts")
+
+    def __init__(self, monsters: tuple[MonsterBase, ...], keys: Optional[tuple] = None, descending: bool = True) -> None:
+        """
+        Record the current state of the given monsters.
+        Complexity: O(n), where n is the number of monsters
+        """
+        self.monsters = monsters
+        self.levels = array("q", [monster.level for monster in monsters])
+        self.start_levels = array("q", [monster.start_level for monster in monsters])
+        self.hps = array("q", [monster.hp for monster in monsters])
+        self.element_counts = array("I", bytes(4 * len(Element)))
+        for monster in monsters:
+            self.element_counts[monster.get_element_index()] += 1
+        self.keys = keys
+        self.descending = descending
+
+    def __len__(self) -> int:
+        """Number of monsters in the snapshot. Complexity: O(1)"""
+        return len(self.monsters)
+
+    def restore_monster(self, index: int) -> MonsterBase:
+        """
+        Returns the monster at this position, reset to its recorded state.
+        Complexity: O(1)
+        """
+        monster = self.monsters[index]
+        monster.restore_state(self.levels[index], self.start_levels[index], self.hps[index])
+        return monster
+
+
 class MonsterTeam:
 
     class TeamMode(BaseEnum):
@@ -42,24 +87,30 @@ class MonsterTeam:
 
     def __init__(self, team_mode: TeamMode, selection_mode, **kwargs) -> None:
         """Initialises a new instance of a MonsterTeam
+        The optional `rng` keyword gives the random stream used for RANDOM selection, defaulting to RandomGen.
+        The optional `team_limit` keyword sets the maximum team size, defaulting to TEAM_LIMIT.
+        The team containers start at TEAM_LIMIT and grow as needed, so large limits cost nothing up front.
         Commplexity: BACK, FRONT, OPTIMISE O(n), where n is the number of monsters in the team"""
         self.team_mode = team_mode
-        self.team_maxsize = MonsterTeam.TEAM_LIMIT
+        self.team_maxsize = kwargs.get("team_limit", MonsterTeam.TEAM_LIMIT)
+        if self.team_maxsize < 1:
+            raise ValueError("team_limit must be at least 1")
+        self.rng = kwargs.get("rng") or RandomGen
+        initial_capacity = min(self.team_maxsize, MonsterTeam.TEAM_LIMIT)
 
         if self.team_mode == MonsterTeam.TeamMode.FRONT:
-            self.team = ArrayStack(self.team_maxsize)
-            self.initial_team = ArrayStack(self.team_maxsize)
+            self.team = GrowableStack(initial_capacity)
         elif self.team_mode == MonsterTeam.TeamMode.BACK:
-            self.team = CircularQueue(self.team_maxsize)
-            self.initial_team = CircularQueue(self.team_maxsize)
+            self.team = GrowableQueue(initial_capacity)
         
         elif self.team_mode == MonsterTeam.TeamMode.OPTIMISE:
             self.descending = True
             if "sort_key" not in kwargs:
                 raise ValueError("sort_key is required for Optimise Team Mode")
             self.sort_key = kwargs["sort_key"]
-            self.team = ArraySortedList(self.team_maxsize)
-            self.initial_team = ArraySortedList(self.team_maxsize)
+            # Insertion counter, breaks ties between equal sort keys.
+            self.added_count = 0
+            self.team = MinMaxHeap(initial_capacity)
 
         if selection_mode == self.SelectionMode.RANDOM:
             self.select_randomly()
@@ -71,28 +122,23 @@ class MonsterTeam:
             raise ValueError(f"selection_mode {selection_mode} not supported.")
         
         if self.team_mode == MonsterTeam.TeamMode.FRONT:
-            temp_stack = ArrayStack(self.team_maxsize)
+            temp_stack = ArrayStack(len(self.team))
             while not self.team.is_empty():
                 temp_stack.push(self.team.pop())
             while not temp_stack.is_empty():
-                monster = temp_stack.pop()
-                self.team.push(monster)
-                self.initial_team.push(monster)
+                self.team.push(temp_stack.pop())
 
         elif self.team_mode == MonsterTeam.TeamMode.BACK:
-            temp_queue = CircularQueue(self.team_maxsize)
+            temp_queue = CircularQueue(len(self.team))
             while not self.team.is_empty():
                 temp_queue.append(self.team.serve())
             while not temp_queue.is_empty():
-                monster = temp_queue.serve()
-                self.team.append(monster)
-                self.initial_team.append(monster)
-        
-        elif self.team_mode == MonsterTeam.TeamMode.OPTIMISE:
-            for i in range(len(self.team)):
-                monster_with_key = self.team[i]
-                self.initial_team.add(ListItem(type(monster_with_key.value)(), monster_with_key.key))
-                    
+                self.team.append(temp_queue.serve())
+
+        self.initial_snapshot = self.snapshot()
+        # Monsters of each element that have been on the team since it was last regenerated, evolutions included.
+        self.element_usage = array("I", self.initial_snapshot.element_counts)
+
     def __len__(self) -> int:
         """Returns the number of monsters in the team
         Complexity: O(1)"""
@@ -100,20 +146,22 @@ class MonsterTeam:
     
     def add_to_team(self, monster: MonsterBase) -> None:
         """adds a new monster to the team in the correct position
+        In OPTIMISE mode the sort key is computed here, the only point its HP or level can have changed,
+        and kept with the monster until it is retrieved.
         Complexity: FRONT, BACK O(1), OPTIMISE O(log(n)), where n is the number of monsters in the team"""
-        if len(self.team) >= self.TEAM_LIMIT:
+        if len(self.team) >= self.team_maxsize:
             raise ValueError("Team is full")
         if self.team_mode == MonsterTeam.TeamMode.FRONT:
             self.team.push(monster)
         elif self.team_mode == MonsterTeam.TeamMode.BACK:
             self.team.append(monster)
         elif self.team_mode == MonsterTeam.TeamMode.OPTIMISE:
-            monster_key = ListItem(monster, self._get_sort_key_value(monster))
-            self.team.add(monster_key)
+            self.added_count += 1
+            self.team.add(ListItem(monster, (get_sort_key_value(self.sort_key, monster), self.added_count)))
 
     def retrieve_from_team(self) -> MonsterBase:
         """returns the next monster in the team
-        Complexity: FRONT, BACK O(1), OPTIMISE O(n), where n is the number of monsters in the team"""
+        Complexity: FRONT, BACK O(1), OPTIMISE O(log(n)), where n is the number of monsters in the team"""
         if len(self.team) == 0:
             raise ValueError("Team is empty")
         if self.team_mode == MonsterTeam.TeamMode.FRONT:
@@ -121,12 +169,14 @@ class MonsterTeam:
         elif self.team_mode == MonsterTeam.TeamMode.BACK:
             return self.team.serve()
         elif self.team_mode == MonsterTeam.TeamMode.OPTIMISE:
-            return self.team.delete_at_index(0).value
+            if self.descending:
+                return self.team.delete_max().value
+            return self.team.delete_min().value
             
 
     def special(self) -> None:
         """Perform special operation on the team
-        Complexity: O(n), where n is the number of monsters in the team"""
+        Complexity: FRONT O(1), BACK O(n), OPTIMISE O(1), where n is the number of monsters in the team"""
         if self.team_mode == MonsterTeam.TeamMode.FRONT:
             self._front_special()
          
@@ -134,38 +184,86 @@ class MonsterTeam:
             return self._back_special()
 
         elif self.team_mode == MonsterTeam.TeamMode.OPTIMISE:
-            if self.descending is True:
-                self.descending = False
-            else:
-                self.descending = True
-            self._resort_team()
+            # The heap serves both ends, so flipping the order needs no re-sort.
+            self.descending = not self.descending
             
 
     def regenerate_team(self) -> None:
         """Regenerate the team how it was at initialization
+        Complexity: O(n), where n is the number of monsters in the team"""
+        self.restore(self.initial_snapshot)
+
+    def record_evolution(self, evolved: MonsterBase) -> None:
+        """Counts the element of a monster that evolved while out of this team in its element usage
         Complexity: O(1)"""
-        self.team = self.initial_team
+        self.element_usage[evolved.get_element_index()] += 1
+
+    def snapshot(self) -> TeamSnapshot:
+        """Records the current team so it can be restored later, leaving the team unchanged
+        Complexity: O(n), where n is the number of monsters in the team"""
+        monsters = ArrayR(max(len(self.team), 1))
+        count = len(self.team)
+        if self.team_mode == MonsterTeam.TeamMode.FRONT:
+            for i in range(count):
+                monsters[i] = self.team.pop()
+            for i in range(count - 1, -1, -1):
+                self.team.push(monsters[i])
+        elif self.team_mode == MonsterTeam.TeamMode.BACK:
+            for i in range(count):
+                monsters[i] = self.team.serve()
+                self.team.append(monsters[i])
+        elif self.team_mode == MonsterTeam.TeamMode.OPTIMISE:
+            keys = tuple(self.team[i].key for i in range(count))
+            return TeamSnapshot(tuple(self.team[i].value for i in range(count)), keys, self.descending)
+        return TeamSnapshot(tuple(monsters[i] for i in range(count)))
+
+    def restore(self, snapshot: TeamSnapshot) -> None:
+        """Puts the team back to the state recorded in the snapshot, reusing the same monster instances
+        Complexity: O(n), where n is the number of monsters in the snapshot"""
+        self.element_usage = array("I", snapshot.element_counts)
+        self.team.clear()
+        if self.team_mode == MonsterTeam.TeamMode.FRONT:
+            for i in range(len(snapshot) - 1, -1, -1):
+                self.team.push(snapshot.restore_monster(i))
+        elif self.team_mode == MonsterTeam.TeamMode.BACK:
+            for i in range(len(snapshot)):
+                self.team.append(snapshot.restore_monster(i))
+        elif self.team_mode == MonsterTeam.TeamMode.OPTIMISE:
+            self.descending = snapshot.descending
+            for i in range(len(snapshot)):
+                self.team.add(ListItem(snapshot.restore_monster(i), snapshot.keys[i]))
 
     def select_randomly(self):
-        team_size = RandomGen.randint(1, self.TEAM_LIMIT)
-        monsters = get_all_monsters()
-        n_spawnable = 0
-        for x in range(len(monsters)):
-            if monsters[x].can_be_spawned():
-                n_spawnable += 1
+        """
+        Adds a random number of random spawnable monsters to the team.
+        Complexity: O(t * Comp(add_to_team)), where t is the team size
+        """
+        team_size = self.rng.randint(1, self.team_maxsize)
+        spawnable = get_monster_registry().get_spawnable()
+        if len(spawnable) == 0:
+            raise ValueError("Spawning logic failed.")
 
         for _ in range(team_size):
-            spawner_index = RandomGen.randint(0, n_spawnable-1)
-            cur_index = -1
-            for x in range(len(monsters)):
-                if monsters[x].can_be_spawned():
-                    cur_index += 1
-                    if cur_index == spawner_index:
-                        # Spawn this monster
-                        self.add_to_team(monsters[x]())
-                        break
-            else:
-                raise ValueError("Spawning logic failed.")
+            self.add_to_team(spawnable[self.rng.randint(0, len(spawnable)-1)]())
+
+    @classmethod
+    def generate_random_teams(cls, n: int, team_mode: TeamMode, rng=None, **kwargs) -> ArrayR[MonsterTeam]:
+        """
+        Generates n random teams in one pass, the same teams as n RANDOM selections from the same stream.
+        Complexity: O(n * Comp(MonsterTeam())), where n is the number of teams
+        """
+        rng = rng or RandomGen
+        team_limit = kwargs.get("team_limit", cls.TEAM_LIMIT)
+        spawnable = get_monster_registry().get_spawnable()
+        teams = ArrayR(n)
+        for i in range(n):
+            team_size = rng.randint(1, team_limit)
+            picks = rng.randints(team_size, 0, len(spawnable)-1)
+            provided = ArrayR(team_size)
+            for j in range(team_size):
+                provided[j] = spawnable[picks[j]]
+            teams[i] = MonsterTeam(team_mode, cls.SelectionMode.PROVIDED, provided_monsters=provided, rng=rng, **kwargs)
+        return teams
 
     def select_manually(self):
         """
@@ -187,10 +285,10 @@ class MonsterTeam:
         while True:
             try:
                 team_size = int(input("How many monsters are there?"))
-                if 0 < team_size <= MonsterTeam.TEAM_LIMIT:
+                if 0 < team_size <= self.team_maxsize:
                     break
                 else: 
-                    print(f"Please enter a number between 1 and {MonsterTeam.TEAM_LIMIT}")
+                    print(f"Please enter a number between 1 and {self.team_maxsize}")
             except TypeError:
                 print("Please enter a number")
 
@@ -218,8 +316,8 @@ class MonsterTeam:
         Complexity: O(n * Comp(add_to_team)), where n is the number of monsters provided
         
         """
-        if len(provided_monsters) > MonsterTeam.TEAM_LIMIT:
-            raise ValueError(f"Too many monsters were provided, maximum is {MonsterTeam.TEAM_LIMIT}")
+        if len(provided_monsters) > self.team_maxsize:
+            raise ValueError(f"Too many monsters were provided, maximum is {self.team_maxsize}")
         for monster in provided_monsters:
             if not monster.can_be_spawned():
                 raise ValueError(f"{monster.get_name()} can't be spawned")
@@ -233,43 +331,12 @@ class MonsterTeam:
             return Battle.Action.ATTACK
         return Battle.Action.SWAP
         
-    def _get_sort_key_value(self, monster: MonsterBase) -> int:
-        """
-        Gets the value that the monster has for the given sort key
-        Complexity: O(1)
-        """
-        if self.sort_key == MonsterTeam.SortMode.ATTACK:
-            return -monster.get_attack() if self.descending else monster.get_attack()
-        if self.sort_key == MonsterTeam.SortMode.DEFENSE:
-            return -monster.get_defense() if self.descending else monster.get_defense()
-        if self.sort_key == MonsterTeam.SortMode.SPEED:
-            return -monster.get_speed() if self.descending else monster.get_speed()
-        if self.sort_key == MonsterTeam.SortMode.HP:
-            return -monster.get_hp() if self.descending else monster.get_hp()
-        if self.sort_key == MonsterTeam.SortMode.LEVEL:
-            return -monster.get_level() if self.descending else monster.get_level()
-        else:
-            raise ValueError("Invalid sort_key")
-        
-    def _resort_team(self) -> ArraySortedList:
-        """Resorts the team after special has been called
-        Complexity: O(n) where n is the number of monsters in the team"""
-        resorted_team = ArraySortedList(self.team_maxsize)
-        for monster_with_key in self.team:
-            if monster_with_key:
-                monster_with_reversed_key = ListItem(monster_with_key.value, self._get_sort_key_value(monster_with_key.value))
-                resorted_team.add(monster_with_reversed_key)
-        self.team = ArraySortedList(self.team_maxsize)
-        for monster in resorted_team:
-            if monster:
-                self.team.add(monster)
-
-    def _back_special(self) -> CircularQueue:
+    def _back_special(self) -> GrowableQueue:
         """First half of the team is swapped with the second half 
         Complexity: O(n) where n is the number of monsters in the team"""
         temp1 = CircularQueue(len(self.team))
         temp2 = ArrayStack(len(self.team))
-        new_team = CircularQueue(len(self.team))
+        new_team = GrowableQueue(len(self.team))
 
         for _ in range(len(self.team) // 2):
             temp1.append(self.team.serve())
@@ -285,7 +352,7 @@ class MonsterTeam:
         self.team = new_team
         return self.team
     
-    def _front_special(self) -> ArrayStack:
+    def _front_special(self) -> GrowableStack:
         """3 monsters at the front are reversed
         Complexity: O(n), where n is the number of monsters in the team"""
         temp = ArrayR(3)
@@ -300,3 +367,22 @@ class MonsterTeam:
         for i in range(counter):
             self.team.push(temp[i])
         return self.team
+
+
+def get_sort_key_value(sort_key: MonsterTeam.SortMode, monster: MonsterBase) -> int:
+    """
+    Gets the value that the monster has for the given sort key, used to order OPTIMISE teams
+    Complexity: O(1)
+    """
+    if sort_key == MonsterTeam.SortMode.ATTACK:
+        return monster.get_attack()
+    if sort_key == MonsterTeam.SortMode.DEFENSE:
+        return monster.get_defense()
+    if sort_key == MonsterTeam.SortMode.SPEED:
+        return monster.get_speed()
+    if sort_key == MonsterTeam.SortMode.HP:
+        return monster.get_hp()
+    if sort_key == MonsterTeam.SortMode.LEVEL:
+        return monster.get_level()
+    else:
+        raise ValueError("Invalid sort_key")
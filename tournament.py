@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+from array import array
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator, Optional, Sequence
+
+from random_gen import RandomStream
+from battle import Battle
+from simulation import Matchup, TeamSpec, run_matchup, worker_pool
+
+class TournamentResult:
+    """
+    Results of a tournament between M teams.
+
+    Attributes:
+        size (int): Number of teams, M
+        scores (array): M*M row major, scores[i*M + j] is team i's score against team j (1 per win, 0.5 per draw)
+        games (array): M*M row major, games[i*M + j] is the number of games between teams i and j
+        points (array): Total score of each team, plus any byes
+        ratings (array): Elo rating of each team
+    """
+
+    INITIAL_RATING = 1500.0
+
+    def __init__(self, size: int, k_factor: float = 32.0) -> None:
+        """
+        Complexity: O(M^2)
+        """
+        self.size = size
+        self.k_factor = k_factor
+        self.scores = array("d", bytes(8 * size * size))
+        self.games = array("I", bytes(4 * size * size))
+        self.points = array("d", bytes(8 * size))
+        self.ratings = array("d", [self.INITIAL_RATING]) * size
+
+    def record(self, i: int, j: int, result: Battle.Result) -> None:
+        """
+        Adds one game where team i was team 1 and team j was team 2, updating the matrix and both ratings.
+        Complexity: O(1)
+        """
+        if result == Battle.Result.TEAM1:
+            score = 1.0
+        elif result == Battle.Result.TEAM2:
+            score = 0.0
+        else:
+            score = 0.5
+        size = self.size
+        self.scores[i * size + j] += score
+        self.scores[j * size + i] += 1.0 - score
+        self.games[i * size + j] += 1
+        self.games[j * size + i] += 1
+        self.points[i] += score
+        self.points[j] += 1.0 - score
+
+        expected = 1.0 / (1.0 + 10.0 ** ((self.ratings[j] - self.ratings[i]) / 400.0))
+        change = self.k_factor * (score - expected)
+        self.ratings[i] += change
+        self.ratings[j] -= change
+
+    def win_rate(self, i: int, j: int) -> float:
+        """Team i's score against team j per game, draws counting as half. Complexity: O(1)"""
+        games = self.games[i * self.size + j]
+        if games == 0:
+            raise ValueError(f"Teams {i} and {j} have not played")
+        return self.scores[i * self.size + j] / games
+
+    def ranking(self) -> list[int]:
+        """Team indices from highest to lowest rating. Complexity: O(M log M)"""
+        return sorted(range(self.size), key=lambda team: (-self.ratings[team], team))
+
+
+class Tournament:
+    """
+    Plays many fixed teams against each other over a pool of worker processes.
+
+    Each pairing plays g = games_per_pairing games, alternating which team goes first, since battles are not symmetric.
+    Teams given by monster_names are the same in every game, and battles have no randomness of their own,
+    so two such teams can only play two different games; more would repeat a result and count it again.
+    The seeds of pairing k's games are draws k*g to k*g + g - 1 of the tournament's stream, reached with a jump,
+    so the results do not depend on the number of workers and any number of pairings can be played.
+    Ratings are updated in pairing order once a round's games are back, so they are reproducible too.
+
+    Usage:
+        tournament = Tournament([TeamSpec(("Flamikin", "Aquariuma")), ...], seed=1)
+        result = tournament.round_robin()
+        result.win_rate(0, 1), result.ranking()
+    """
+
+    def __init__(self, teams: Sequence[TeamSpec], seed: int, games_per_pairing: int = 2,
+                 max_workers: Optional[int] = None, chunk_size: int = 64, k_factor: float = 32.0) -> None:
+        if len(teams) < 2:
+            raise ValueError("A tournament needs at least two teams")
+        if games_per_pairing < 1:
+            raise ValueError("games_per_pairing must be at least 1")
+        if games_per_pairing > 2 and sum(team.monster_names is not None for team in teams) >= 2:
+            raise ValueError("Battles between two fixed teams always end the same way, so with more than one team "
+                             "given by monster_names games_per_pairing can be at most 2, one game with each team first")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.teams = tuple(teams)
+        self.rng = RandomStream(seed)
+        self.games_per_pairing = games_per_pairing
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.k_factor = k_factor
+        # Index of the next pairing in the tournament's stream, reset by every tournament run.
+        self.pairings_played = 0
+
+    def round_robin(self) -> TournamentResult:
+        """
+        Plays every pair of teams against each other.
+        Complexity: O(M^2 * g * Comp(Battle.battle) / w), with M teams, g games per pairing and w workers
+        """
+        self.pairings_played = 0
+        result = TournamentResult(len(self.teams), self.k_factor)
+        pairs = [(i, j) for i in range(len(self.teams)) for j in range(i + 1, len(self.teams))]
+        with self._executor() as executor:
+            self._play_round(pairs, result, executor)
+        return result
+
+    def swiss(self, rounds: int) -> TournamentResult:
+        """
+        Plays a number of rounds, each pairing teams on similar points that have not met yet.
+        With an odd number of teams the lowest placed team without a bye sits out and scores a full round of wins.
+        Complexity: O(r * (M log M + M * g * Comp(Battle.battle) / w)), with r rounds, M teams,
+        g games per pairing and w workers, plus O(M^2) per round for rematch avoidance in the worst case
+        """
+        self.pairings_played = 0
+        size = len(self.teams)
+        result = TournamentResult(size, self.k_factor)
+        had_bye = array("b", bytes(size))
+        with self._executor() as executor:
+            for _ in range(rounds):
+                standings = sorted(range(size), key=lambda team: (-result.points[team], team))
+                if size % 2 == 1:
+                    bye = next((team for team in reversed(standings) if not had_bye[team]), standings[-1])
+                    standings.remove(bye)
+                    had_bye[bye] = 1
+                    result.points[bye] += self.games_per_pairing
+                self._play_round(self._swiss_pairs(standings, result), result, executor)
+        return result
+
+    def _swiss_pairs(self, standings: list[int], result: TournamentResult) -> list[tuple[int, int]]:
+        """Pairs each team with the next highest placed team it has not played, or the next one if it has played all"""
+        unpaired = list(standings)
+        pairs = []
+        while unpaired:
+            team = unpaired.pop(0)
+            opponent = next((other for other in unpaired if result.games[team * result.size + other] == 0), unpaired[0])
+            unpaired.remove(opponent)
+            pairs.append((team, opponent))
+        return pairs
+
+    def _play_round(self, pairs: list[tuple[int, int]], result: TournamentResult, executor: Optional[Executor]) -> None:
+        """Plays every game of these pairings and records them in pairing order"""
+        matchups = []
+        for i, j in pairs:
+            pair_rng = RandomStream(self.rng.seed)
+            pair_rng.jump(self.pairings_played * self.games_per_pairing)
+            self.pairings_played += 1
+            for game in range(self.games_per_pairing):
+                if game % 2 == 0:
+                    matchups.append(Matchup(self.teams[i], self.teams[j], pair_rng.random()))
+                else:
+                    matchups.append(Matchup(self.teams[j], self.teams[i], pair_rng.random()))
+
+        chunks = [matchups[k:k + self.chunk_size] for k in range(0, len(matchups), self.chunk_size)]
+        if executor is None:
+            outcomes = [_play_chunk(chunk) for chunk in chunks]
+        else:
+            outcomes = executor.map(_play_chunk, chunks)
+        results = array("b")
+        for chunk_results in outcomes:
+            results.extend(chunk_results)
+
+        game_results = iter(results)
+        for i, j in pairs:
+            for game in range(self.games_per_pairing):
+                outcome = Battle.Result(next(game_results))
+                if game % 2 == 0:
+                    result.record(i, j, outcome)
+                else:
+                    result.record(j, i, outcome)
+
+    @contextmanager
+    def _executor(self) -> Iterator[Optional[ProcessPoolExecutor]]:
+        """A worker pool sharing the game data, or None so games run in this process when max_workers is 1"""
+        if self.max_workers == 1:
+            yield None
+            return
+        with worker_pool(self.max_workers) as executor:
+            yield executor
+
+
+def _play_chunk(matchups: list[Matchup]) -> array:
+    """Runs a chunk of games inside a worker, returning the Battle.Result value of each"""
+    results = array("b", bytes(len(matchups)))
+    for k, matchup in enumerate(matchups):
+        results[k] = run_matchup(matchup)[0].value
+    return results
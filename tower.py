@@ -1,6 +1,8 @@
 from __future__ import annotations
+from array import array
+from typing import Iterator
 
-from random_gen import RandomGen
+from random_gen import RandomGen, RandomStream
 from team import MonsterTeam
 from battle import Battle
 
@@ -8,27 +10,127 @@ from elements import Element
 
 from data_structures.referential_array import ArrayR
 
+
+class LivesIndex:
+    """
+    Teams bucketed by lives, so they can be listed in order of lives without sorting.
+
+    Each bucket is a doubly linked list of team indices held in flat arrays. Moving a team down a life
+    is O(1), and listing every team is O(n + L), where L is the number of possible lives.
+    A team losing a life joins the front of its new bucket, except at 0 lives where it joins the back.
+    As the tower always fights the first team with lives left, this keeps every bucket in team order.
+    """
+
+    def __init__(self, lives: ArrayR[int], max_lives: int) -> None:
+        """
+        Buckets the teams by their current lives.
+        Complexity: O(n + L), where n is the number of teams and L is max_lives
+        """
+        n = len(lives)
+        self.head = array("q", [-1]) * (max_lives + 1)
+        self.tail = array("q", [-1]) * (max_lives + 1)
+        self.next = array("q", [-1]) * n
+        self.prev = array("q", [-1]) * n
+        self.lives = array("q", bytes(8 * n))
+        for team in range(n):
+            self.lives[team] = lives[team]
+            self._push_back(team, lives[team])
+
+    def remove_life(self, team: int) -> None:
+        """
+        Moves a team down one life.
+        Complexity: O(1)
+        """
+        self._unlink(team)
+        self.lives[team] -= 1
+        if self.lives[team] == 0:
+            self._push_back(team, 0)
+        else:
+            self._push_front(team, self.lives[team])
+
+    def in_order(self) -> ArrayR[int]:
+        """
+        Team indices from fewest to most lives.
+        Complexity: O(n + L), where n is the number of teams and L is the maximum lives
+        """
+        ordered = ArrayR(len(self.lives))
+        position = 0
+        for bucket in range(len(self.head)):
+            team = self.head[bucket]
+            while team != -1:
+                ordered[position] = team
+                position += 1
+                team = self.next[team]
+        return ordered
+
+    def _unlink(self, team: int) -> None:
+        bucket = self.lives[team]
+        before, after = self.prev[team], self.next[team]
+        if before == -1:
+            self.head[bucket] = after
+        else:
+            self.next[before] = after
+        if after == -1:
+            self.tail[bucket] = before
+        else:
+            self.prev[after] = before
+
+    def _push_front(self, team: int, bucket: int) -> None:
+        first = self.head[bucket]
+        self.prev[team] = -1
+        self.next[team] = first
+        if first == -1:
+            self.tail[bucket] = team
+        else:
+            self.prev[first] = team
+        self.head[bucket] = team
+
+    def _push_back(self, team: int, bucket: int) -> None:
+        last = self.tail[bucket]
+        self.next[team] = -1
+        self.prev[team] = last
+        if last == -1:
+            self.head[bucket] = team
+        else:
+            self.next[last] = team
+        self.tail[bucket] = team
+
+
 class BattleTower:
 
     MIN_LIVES = 2
     MAX_LIVES = 10
+    ELEMENT_HISTORY = 64
 
-    def __init__(self, battle: Battle|None=None) -> None:
+    def __init__(self, battle: Battle|None=None, rng: RandomStream|None=None, element_history: int=ELEMENT_HISTORY) -> None:
         """Initialises a tower
-        Complexity: O(1)"""
+        rng is the random stream used for lives and enemy teams, defaulting to RandomGen.
+        element_history is how many of the latest battles element_frequency can look back over.
+        Complexity: O(K * E), where K is element_history and E the number of elements"""
+        if element_history < 1:
+            raise ValueError("element_history must be at least 1")
         self.battle = battle or Battle(verbosity=0)
+        self.rng = rng or RandomGen
         self.user_team = None
         self.user_lives = 0
         self.all_enemy_teams = None
         self.all_enemy_lives = None
+        self.lives_index = None
         self.enemy_lives_total = 0
+        self.next_enemy = 0
+        # Running totals of the monsters of each element (by Element.index) in both teams, one row per battle fought.
+        # Row b sums the first b battles, so any window of battles is the difference of two rows.
+        # Only the latest K + 1 rows are kept, row b in slot b % (K + 1), so memory does not grow with the battles.
+        self.element_history_limit = element_history
+        self.element_history = array("Q", bytes(8 * len(Element) * (element_history + 1)))
+        self.battles_fought = 0
 
     def set_my_team(self, team: MonsterTeam) -> None:
         """Sets the users team and lives
         Complexity: O(1)"""
         # Generate the team lives here too.
         self.user_team = team
-        self.user_lives = RandomGen.randint(self.MIN_LIVES, self.MAX_LIVES)
+        self.user_lives = self.rng.randint(self.MIN_LIVES, self.MAX_LIVES)
         
 
     def generate_teams(self, n: int) -> None:
@@ -36,64 +138,165 @@ class BattleTower:
         Complexity: O(n * Comp(MonsterTeam())), where n is the number of enemy teams"""
         self.all_enemy_teams = ArrayR(n)
         self.all_enemy_lives = ArrayR(n)
+        self.enemy_lives_total = 0
+        self.next_enemy = 0
         for i in range(n):
-            enemy_team = MonsterTeam(team_mode=MonsterTeam.TeamMode.BACK, selection_mode=MonsterTeam.SelectionMode.RANDOM)
-            enemy_lives = RandomGen.randint(self.MIN_LIVES, self.MAX_LIVES)
+            enemy_team = MonsterTeam(team_mode=MonsterTeam.TeamMode.BACK, selection_mode=MonsterTeam.SelectionMode.RANDOM, rng=self.rng)
+            enemy_lives = self.rng.randint(self.MIN_LIVES, self.MAX_LIVES)
             self.all_enemy_teams[i] = enemy_team
             self.all_enemy_lives[i] = enemy_lives
+            self.enemy_lives_total += enemy_lives
+        self.lives_index = LivesIndex(self.all_enemy_lives, self.MAX_LIVES)
 
 
     def battles_remaining(self) -> bool:
         """Checks if the user or all enemy teams are out of lives, aka if the tower is over
-        Complexity: O(n) where n is the number of enemy teams"""
-        if self.user_lives <= 0:
-            return False
-        for lives in self.all_enemy_lives:
-            if lives > 0:
-                return True
-        return False
+        Complexity: O(1)"""
+        return self.user_lives > 0 and self.enemy_lives_total > 0
 
     def next_battle(self) -> tuple[Battle.Result, MonsterTeam, MonsterTeam, int, int]:
         """Determines and completes the next battle
-        Complexity: O(n + Comp(Battle())), where n is the number of enemy teams"""
-        enemy_to_battle = None
-        for i, lives in enumerate(self.all_enemy_lives):
-            if lives > 0:
-                enemy_to_battle = i
-                break
+        Complexity: O(Comp(Battle())) amortised, the search for the next enemy only ever moves forward"""
+        enemy_to_battle = self._find_next_enemy()
         if enemy_to_battle is None:
             return None
-        self.user_team.regenerate_team()
-        self.all_enemy_teams[enemy_to_battle].regenerate_team()
-        battle_result = self.battle.battle(self.user_team, self.all_enemy_teams[enemy_to_battle])
+        battle_result = self._fight(self.all_enemy_teams[enemy_to_battle])
 
         if battle_result == Battle.Result.TEAM1:
-            self.all_enemy_lives[enemy_to_battle] -= 1
+            self._remove_enemy_life(enemy_to_battle)
         elif battle_result == Battle.Result.TEAM2:
             self.user_lives -= 1
         else:
             self.user_lives -= 1
-            self.all_enemy_lives[enemy_to_battle] -= 1
-        self.enemy_lives_total = self._calculate_enemy_lives()
+            self._remove_enemy_life(enemy_to_battle)
         return battle_result, self.user_team, self.all_enemy_teams[enemy_to_battle], self.user_lives, self.enemy_lives_total
 
+    def iter_battles(self) -> Iterator[tuple[Battle.Result, int, int]]:
+        """Runs the rest of the tower, yielding (result, user lives, enemy lives total) after every battle
+        Complexity: O(b * Comp(next_battle)), where b is the number of battles fought"""
+        while self.battles_remaining():
+            battle_result, _, _, user_lives, enemy_lives_total = self.next_battle()
+            yield battle_result, user_lives, enemy_lives_total
 
+    def stream_battles(self, n: int|None=None) -> Iterator[tuple[Battle.Result, int, int|None]]:
+        """Runs a tower of n enemy teams (endless if n is None) without generating the teams up front.
+        Yields (result, user lives, enemy lives total) after every battle.
 
-        
+        Enemy teams come from their own substream of this tower's rng and are generated only when
+        they are next to fight. Only the team currently being fought is held, so memory stays flat.
+        Enemy lives come from a second substream and are drawn as each team is reached. For a finite tower
+        the total is counted first by a pass over a copy of that substream, so no lives are stored,
+        and the total is None for an endless tower.
+        A streamed tower is reproducible from its seed, but does not draw the same teams as generate_teams.
+
+        Complexity: O(n + b * Comp(Battle()) + e * Comp(MonsterTeam())), where b is the number of battles
+        and e the number of enemy teams reached"""
+        team_rng = self.rng.substream(0)
+        lives_rng = self.rng.substream(1)
+        enemy_lives_total = None
+        if n is not None:
+            # Count the lives on a copy of the stream, then draw them again one team at a time.
+            counting_rng = RandomStream(lives_rng.seed)
+            enemy_lives_total = 0
+            for _ in range(n):
+                enemy_lives_total += counting_rng.randint(self.MIN_LIVES, self.MAX_LIVES)
+
+        enemy = 0
+        while self.user_lives > 0 and (n is None or enemy < n):
+            enemy_team = MonsterTeam(team_mode=MonsterTeam.TeamMode.BACK, selection_mode=MonsterTeam.SelectionMode.RANDOM, rng=team_rng)
+            enemy_lives = lives_rng.randint(self.MIN_LIVES, self.MAX_LIVES)
+            while enemy_lives > 0 and self.user_lives > 0:
+                battle_result = self._fight(enemy_team)
+                if battle_result != Battle.Result.TEAM2:
+                    enemy_lives -= 1
+                    if enemy_lives_total is not None:
+                        enemy_lives_total -= 1
+                if battle_result != Battle.Result.TEAM1:
+                    self.user_lives -= 1
+                yield battle_result, self.user_lives, enemy_lives_total
+            # The team is out of lives, drop it before generating the next one.
+            enemy_team = None
+            enemy += 1
 
-    def out_of_meta(self) -> ArrayR[Element]:
-        raise NotImplementedError
+    def out_of_meta(self) -> tuple[Element, ...]:
+        """Returns the elements that appeared in an earlier battle but not in the latest one, in Element order
+        Complexity: O(E), where E is the number of elements"""
+        if self.battles_fought == 0:
+            return ()
+        latest = self._history_row(self.battles_fought - 1)
+        current = self._history_row(self.battles_fought)
+        history = self.element_history
+        return tuple(
+            element for element in Element
+            if history[latest + element.index()] > 0 and history[current + element.index()] == history[latest + element.index()]
+        )
+
+    def element_frequency(self, k: int) -> array:
+        """Returns how many monsters of each element (indexed by Element.index) fought in the last k battles,
+        where k is at most the tower's element_history
+        Complexity: O(E), where E is the number of elements"""
+        if k < 0:
+            raise ValueError("k must not be negative")
+        if k > self.element_history_limit:
+            raise ValueError(f"Only the last {self.element_history_limit} battles are kept")
+        current = self._history_row(self.battles_fought)
+        earlier = self._history_row(max(self.battles_fought - k, 0))
+        history = self.element_history
+        return array("I", [history[current + i] - history[earlier + i] for i in range(len(Element))])
     
-    def sort_by_lives(self):
-        # 1054 ONLY
-        raise NotImplementedError
-
-    def _calculate_enemy_lives(self):
-        """Calculates the total number of enemy lives
-        Complexity: O(n), where n is the number of enemy teams"""
-        for enemy_lives in self.all_enemy_lives:
-            self.enemy_lives_total += enemy_lives
-        return self.enemy_lives_total
+    def sort_by_lives(self) -> ArrayR[int]:
+        """Returns the indices of the enemy teams in all_enemy_teams from fewest to most lives left,
+        teams with equal lives in team order. The index is kept up to date by next_battle, so nothing is sorted.
+        Complexity: O(n + MAX_LIVES), where n is the number of enemy teams"""
+        if self.lives_index is None:
+            raise ValueError("Enemy teams have not been generated")
+        return self.lives_index.in_order()
+
+    def _fight(self, enemy_team: MonsterTeam) -> Battle.Result:
+        """Resets both teams and battles the user team against the given enemy team
+        Complexity: O(Comp(regenerate_team) + Comp(Battle()))"""
+        self.user_team.regenerate_team()
+        enemy_team.regenerate_team()
+        result = self.battle.battle(self.user_team, enemy_team)
+        self._record_elements(enemy_team)
+        return result
+
+    def _record_elements(self, enemy_team: MonsterTeam) -> None:
+        """Adds a row for the battle just fought to the element history, over the oldest row kept
+        Complexity: O(E), where E is the number of elements"""
+        previous = self._history_row(self.battles_fought)
+        current = self._history_row(self.battles_fought + 1)
+        user_usage = self.user_team.element_usage
+        enemy_usage = enemy_team.element_usage
+        history = self.element_history
+        for i in range(len(Element)):
+            history[current + i] = history[previous + i] + user_usage[i] + enemy_usage[i]
+        self.battles_fought += 1
+
+    def _history_row(self, battles: int) -> int:
+        """Start of the element history row summing the first given number of battles
+        Complexity: O(1)"""
+        return battles % (self.element_history_limit + 1) * len(Element)
+
+    def _find_next_enemy(self) -> int|None:
+        """Returns the index of the first enemy team with lives left, or None if there are none.
+        Lives never go back up, so the cursor only moves forward.
+        Complexity: O(1) amortised over a tower run"""
+        if self.all_enemy_lives is None:
+            return None
+        while self.next_enemy < len(self.all_enemy_lives) and self.all_enemy_lives[self.next_enemy] <= 0:
+            self.next_enemy += 1
+        if self.next_enemy == len(self.all_enemy_lives):
+            return None
+        return self.next_enemy
+
+    def _remove_enemy_life(self, enemy: int) -> None:
+        """Takes a life from an enemy team, keeping the running total in step
+        Complexity: O(1)"""
+        self.all_enemy_lives[enemy] -= 1
+        self.enemy_lives_total -= 1
+        self.lives_index.remove_life(enemy)
+
 def tournament_balanced(tournament_array: ArrayR[str]):
     # 1054 ONLY
     raise NotImplementedError
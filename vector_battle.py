@@ -0,0 +1,291 @@
+"""
+Vectorised battle engine: simulates many independent battles in lockstep with NumPy.
+
+Every battle's state (the monster out on each side and the monsters waiting in each team)
+lives in NumPy arrays, and each step of Battle.process_turn is applied to all battles at
+once as masked array operations. Results match Battle.battle for the same teams, including
+its quirks, so large Monte Carlo sweeps can use this engine in place of the object model.
+
+Only simple stats and the FRONT and BACK team modes are supported.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+from random_gen import RandomStream
+from helpers import get_all_monsters, get_monster_registry
+from elements import EffectivenessCalculator
+from shared_tables import STATS_ENV, STAT_FIELDS, attach, stat_table
+from team import MonsterTeam
+from battle import Battle
+
+
+class MonsterTable:
+    """
+    Per class stats of every monster, indexed by the class' position in get_all_monsters().
+    In a worker process the arrays are views of the stat table its parent published, see shared_tables.
+    """
+
+    def __init__(self) -> None:
+        """
+        Build the stat arrays.
+        Complexity: O(n), where n is the number of monster classes, O(1) for a published table
+        """
+        monsters = get_all_monsters()
+        n = len(monsters)
+        self.class_ids = {monster.get_name(): i for i, monster in enumerate(monsters)}
+        self.classes = monsters
+        shared = attach(STATS_ENV)
+        stats = np.frombuffer(stat_table() if shared is None else shared, dtype=np.int64).reshape(len(STAT_FIELDS), n)
+        self.attack, self.defense, self.speed, self.max_hp, self.element, self.evolution = stats
+
+        calculator = EffectivenessCalculator.instance
+        self.element_count = calculator.element_count
+        self.effectiveness = np.frombuffer(calculator.effectiveness_table, dtype=np.float64)
+
+    def damage(self, attacker: np.ndarray, defender: np.ndarray) -> np.ndarray:
+        """
+        Vectorised Battle._compute_damage for arrays of attacking and defending class ids.
+        Complexity: O(b), where b is the number of battles
+        """
+        attack = self.attack[attacker].astype(np.float64)
+        defense = self.defense[defender].astype(np.float64)
+        damage = np.where(
+            defense < attack / 2,
+            attack - defense,
+            np.where(defense < attack, attack * 5 / 8 - defense / 4, attack / 4),
+        )
+        multiplier = self.effectiveness[self.element[attacker] * self.element_count + self.element[defender]]
+        return np.ceil(damage * multiplier).astype(np.int64)
+
+
+class _Side:
+    """
+    One side of every battle: the monster currently out, and its team held in a ring buffer.
+
+    BACK teams serve from the head of the buffer, FRONT teams pop from the tail.
+    Both add to the tail.
+    """
+
+    def __init__(self, battles: int, capacity: int) -> None:
+        self.capacity = capacity
+        self.team_class = np.zeros((battles, capacity), dtype=np.int64)
+        self.team_level = np.ones((battles, capacity), dtype=np.int64)
+        self.team_start = np.ones((battles, capacity), dtype=np.int64)
+        self.team_hp = np.zeros((battles, capacity), dtype=np.int64)
+        self.head = np.zeros(battles, dtype=np.int64)
+        self.length = np.zeros(battles, dtype=np.int64)
+        self.front = np.zeros(battles, dtype=bool)
+        self.out_class = np.zeros(battles, dtype=np.int64)
+        self.out_level = np.ones(battles, dtype=np.int64)
+        self.out_start = np.ones(battles, dtype=np.int64)
+        self.out_hp = np.zeros(battles, dtype=np.int64)
+        self.dead = np.zeros(battles, dtype=bool)
+
+    def add(self, mask: np.ndarray) -> None:
+        """Vectorised add_to_team of the monster currently out"""
+        rows = np.nonzero(mask)[0]
+        slot = (self.head[rows] + self.length[rows]) % self.capacity
+        self.team_class[rows, slot] = self.out_class[rows]
+        self.team_level[rows, slot] = self.out_level[rows]
+        self.team_start[rows, slot] = self.out_start[rows]
+        self.team_hp[rows, slot] = self.out_hp[rows]
+        self.length[rows] += 1
+
+    def retrieve(self, mask: np.ndarray) -> None:
+        """Vectorised retrieve_from_team, marking sides with an empty team as dead"""
+        self.dead |= mask & (self.length == 0)
+        rows = np.nonzero(mask & (self.length > 0))[0]
+        front = self.front[rows]
+        slot = np.where(front, self.head[rows] + self.length[rows] - 1, self.head[rows]) % self.capacity
+        self.out_class[rows] = self.team_class[rows, slot]
+        self.out_level[rows] = self.team_level[rows, slot]
+        self.out_start[rows] = self.team_start[rows, slot]
+        self.out_hp[rows] = self.team_hp[rows, slot]
+        self.head[rows] = np.where(front, self.head[rows], (self.head[rows] + 1) % self.capacity)
+        self.length[rows] -= 1
+
+    def level_up(self, mask: np.ndarray, table: MonsterTable) -> None:
+        """Vectorised MonsterBase.level_up (and evolve) of the monster currently out"""
+        self.out_level[mask] += 1
+        evolving = mask & (table.evolution[self.out_class] >= 0) & (self.out_level > self.out_start)
+        old_class = self.out_class[evolving]
+        new_class = table.evolution[old_class]
+        self.out_hp[evolving] = table.max_hp[new_class] - (table.max_hp[old_class] - self.out_hp[evolving])
+        self.out_class[evolving] = new_class
+        self.out_start[evolving] = self.out_level[evolving]
+
+
+class VectorBattle:
+    """
+    Runs many battles at once.
+
+    Usage:
+        engine = VectorBattle.from_seeds(range(100_000))
+        results, turns = engine.run()
+        Battle.Result(results[0]) # The result of the battle seeded with 0
+
+    Results are stored as Battle.Result values.
+    """
+
+    def __init__(self, battles: int, table: MonsterTable | None = None, capacity: int = MonsterTeam.TEAM_LIMIT) -> None:
+        """
+        Allocate empty state for the given number of battles, for teams of up to capacity monsters.
+        Use from_seeds or from_teams to fill it.
+        Complexity: O(b * capacity), where b is the number of battles
+        """
+        self.table = table or MonsterTable()
+        self.battles = battles
+        self.side1 = _Side(battles, capacity)
+        self.side2 = _Side(battles, capacity)
+        self.results = np.zeros(battles, dtype=np.int8)
+        self.turns = np.zeros(battles, dtype=np.int64)
+
+    def _load(self, side: _Side, battle: int, class_ids, front: bool) -> None:
+        """Puts fresh level 1 monsters of the given classes into one side's team, in retrieval order"""
+        side.front[battle] = front
+        side.length[battle] = len(class_ids)
+        order = reversed(class_ids) if front else class_ids
+        for slot, class_id in enumerate(order):
+            side.team_class[battle, slot] = class_id
+            side.team_hp[battle, slot] = self.table.max_hp[class_id]
+
+    @classmethod
+    def from_seeds(cls, seeds) -> VectorBattle:
+        """
+        Builds one battle per seed between two random BACK teams, the same teams as
+        simulation.Matchup(TeamSpec(), TeamSpec(), seed).
+        Complexity: O(b * t), where b is the number of battles and t the team size
+        """
+        seeds = list(seeds)
+        engine = cls(len(seeds))
+        spawnable = get_monster_registry().get_spawnable()
+        spawnable_ids = [engine.table.class_ids[monster.get_name()] for monster in spawnable]
+        for battle, seed in enumerate(seeds):
+            rng = RandomStream(seed)
+            for side in (engine.side1, engine.side2):
+                team_size = rng.randint(1, MonsterTeam.TEAM_LIMIT)
+                picks = rng.randints(team_size, 0, len(spawnable_ids)-1)
+                engine._load(side, battle, [spawnable_ids[pick] for pick in picks], front=False)
+        return engine
+
+    @classmethod
+    def from_teams(cls, teams1, teams2) -> VectorBattle:
+        """
+        Builds one battle per pair of freshly created FRONT or BACK MonsterTeams.
+        The teams are left unchanged.
+        Complexity: O(b * t), where b is the number of battles and t the team size
+        """
+        if len(teams1) != len(teams2):
+            raise ValueError("teams1 and teams2 must be the same length")
+        capacity = max([len(team) for team in teams1] + [len(team) for team in teams2] + [1])
+        engine = cls(len(teams1), capacity=capacity)
+        for battle in range(len(teams1)):
+            for side, team in ((engine.side1, teams1[battle]), (engine.side2, teams2[battle])):
+                engine._load_team(side, battle, team)
+        return engine
+
+    def _load_team(self, side: _Side, battle: int, team: MonsterTeam) -> None:
+        """Copies an existing team into one side, restoring the team's container afterwards"""
+        if team.team_mode == MonsterTeam.TeamMode.OPTIMISE:
+            raise ValueError("VectorBattle does not support OPTIMISE teams")
+        front = team.team_mode == MonsterTeam.TeamMode.FRONT
+        monsters = []
+        for _ in range(len(team)):
+            monsters.append(team.retrieve_from_team())
+        for monster in (reversed(monsters) if front else monsters):
+            team.add_to_team(monster)
+
+        # monsters is in retrieval order, the ring buffer wants it in storage order.
+        side.front[battle] = front
+        side.length[battle] = len(monsters)
+        for slot, monster in enumerate(reversed(monsters) if front else monsters):
+            if not monster.simple_mode:
+                raise ValueError("VectorBattle only supports simple stats")
+            side.team_class[battle, slot] = self.table.class_ids[monster.get_name()]
+            side.team_level[battle, slot] = monster.get_level()
+            side.team_start[battle, slot] = monster.start_level
+            side.team_hp[battle, slot] = monster.get_hp()
+
+    def run(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Runs every battle to completion, returning the Battle.Result value and turn count of each.
+        Complexity: O(b * t), where b is the number of battles and t the length of the longest battle
+        """
+        table = self.table
+        side1, side2 = self.side1, self.side2
+        everyone = np.ones(self.battles, dtype=bool)
+        side1.retrieve(everyone)
+        side2.retrieve(everyone)
+        active = everyone.copy()
+        turn = 0
+
+        while active.any():
+            turn += 1
+            # choose_action for both sides, then swaps.
+            speed1, speed2 = table.speed[side1.out_class], table.speed[side2.out_class]
+            attack1 = (speed1 >= speed2) | (side1.out_hp >= side2.out_hp)
+            attack2 = (speed2 >= speed1) | (side2.out_hp >= side1.out_hp)
+            swap1, swap2 = active & ~attack1, active & ~attack2
+            side1.add(swap1)
+            side1.retrieve(swap1)
+            side2.add(swap2)
+            side2.retrieve(swap2)
+
+            # _both_attack / _attack
+            speed1, speed2 = table.speed[side1.out_class], table.speed[side2.out_class]
+            damage12 = table.damage(side1.out_class, side2.out_class)
+            damage21 = table.damage(side2.out_class, side1.out_class)
+            both = active & attack1 & attack2
+            first1 = both & (speed1 > speed2)
+            first2 = both & (speed1 < speed2)
+            tie = both & (speed1 == speed2)
+            only1 = active & attack1 & ~attack2
+            # Battle.process_turn has team 2 attack its own monster when only team 2 attacks.
+            only2 = active & attack2 & ~attack1
+
+            side2.out_hp -= np.where(first1 | tie | only1, damage12, 0)
+            side1.out_hp -= np.where(first2 | tie, damage21, 0)
+            side1.out_hp -= np.where(first1 & (side2.out_hp > 0), damage21, 0)
+            side2.out_hp -= np.where(first2 & (side1.out_hp > 0), damage12, 0)
+            side2.out_hp -= np.where(only2, table.damage(side2.out_class, side2.out_class), 0)
+
+            # _end_turn
+            alive1, alive2 = side1.out_hp > 0, side2.out_hp > 0
+            chip = active & alive1 & alive2
+            side1.out_hp -= chip
+            side2.out_hp -= chip
+            alive1, alive2 = side1.out_hp > 0, side2.out_hp > 0
+            lost1 = active & alive2 & ~alive1
+            lost2 = active & alive1 & ~alive2
+            side2.level_up(lost1, table)
+            side1.retrieve(lost1)
+            side1.level_up(lost2, table)
+            side2.retrieve(lost2)
+            both_fainted = active & (side1.out_hp <= 0) & (side2.out_hp <= 0)
+            side1.retrieve(both_fainted)
+            side2.retrieve(both_fainted)
+
+            # _check_for_win
+            finished = active & (side1.dead | side2.dead)
+            self.results[finished & side1.dead & side2.dead] = Battle.Result.DRAW.value
+            self.results[finished & side1.dead & ~side2.dead] = Battle.Result.TEAM2.value
+            self.results[finished & ~side1.dead & side2.dead] = Battle.Result.TEAM1.value
+            self.turns[finished] = turn
+            active &= ~finished
+
+        return self.results, self.turns
+
+    def batch_result(self):
+        """
+        Summarises finished battles in the same form as simulation.simulate_batch.
+        Complexity: O(b), where b is the number of battles
+        """
+        from simulation import BatchResult
+        totals = BatchResult()
+        totals.team1_wins = int(np.count_nonzero(self.results == Battle.Result.TEAM1.value))
+        totals.team2_wins = int(np.count_nonzero(self.results == Battle.Result.TEAM2.value))
+        totals.draws = int(np.count_nonzero(self.results == Battle.Result.DRAW.value))
+        turn_counts = np.bincount(self.turns)
+        totals.turn_histogram = {turns: int(count) for turns, count in enumerate(turn_counts) if turns > 0 and count > 0}
+        return totals